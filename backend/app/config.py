@@ -13,3 +13,117 @@ REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "YOUR_GROQ_API_KEY")  # Set your Groq API key here if available
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "YOUR_GEMINI_API_KEY")  # Set your Gemini API key here if available
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "YOUR_OPENAI_API_KEY")  # Set your OpenAI API key here if available
+
+# Crop disease model registry: models load on first use. MAX_RESIDENT caps the
+# unpinned models kept resident on top of the pinned ones below (so with the
+# defaults up to 4 pinned + 4 other crops stay loaded); MAX_MB caps the weights
+# of all resident models, pinned included. 0 means unbounded.
+DISEASE_MODEL_MAX_RESIDENT = int(os.getenv("DISEASE_MODEL_MAX_RESIDENT", 4))
+DISEASE_MODEL_MAX_MB = float(os.getenv("DISEASE_MODEL_MAX_MB", 0))
+# Comma-separated crops that are loaded at startup and never evicted
+DISEASE_MODEL_PINNED = [c.strip() for c in os.getenv("DISEASE_MODEL_PINNED", "rice,wheat,potato,tomato").split(",") if c.strip()]
+# Seconds between checks of a resident model's weights file for replacement
+# (a replaced file is reloaded on the next request); 0 checks on every request
+DISEASE_MODEL_CHECK_INTERVAL_S = float(os.getenv("DISEASE_MODEL_CHECK_INTERVAL_S", 5))
+
+# Micro-batching of concurrent /disease/predict calls per crop model
+DISEASE_BATCH_ENABLED = os.getenv("DISEASE_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+DISEASE_BATCH_MAX_SIZE = int(os.getenv("DISEASE_BATCH_MAX_SIZE", 8))
+DISEASE_BATCH_MAX_WAIT_MS = float(os.getenv("DISEASE_BATCH_MAX_WAIT_MS", 10))
+
+# Bounded executor that keeps disease inference off the asyncio event loop.
+# Requests beyond workers + queue size get 503 with Retry-After.
+DISEASE_INFERENCE_WORKERS = int(os.getenv("DISEASE_INFERENCE_WORKERS", 8))
+DISEASE_INFERENCE_QUEUE_SIZE = int(os.getenv("DISEASE_INFERENCE_QUEUE_SIZE", 32))
+DISEASE_RETRY_AFTER_SECONDS = int(os.getenv("DISEASE_RETRY_AFTER_SECONDS", 2))
+
+# Inference backend for crop disease classifiers: "ultralytics" (best.pt),
+# "onnx" (best.onnx) or "torchscript" (best.torchscript). Export the latter
+# two with `python export_disease_models.py --format onnx`.
+DISEASE_INFERENCE_BACKEND = os.getenv("DISEASE_INFERENCE_BACKEND", "ultralytics").lower()
+
+# Sampled capture of uploaded disease images for debugging misclassifications.
+# Off by default; e.g. 0.01 keeps ~1% of uploads, capped at MAX_FILES on disk.
+DISEASE_CAPTURE_SAMPLE_RATE = float(os.getenv("DISEASE_CAPTURE_SAMPLE_RATE", 0.0))
+DISEASE_CAPTURE_DIR = os.getenv("DISEASE_CAPTURE_DIR", os.path.join(os.path.dirname(__file__), '..', 'captures'))
+DISEASE_CAPTURE_MAX_FILES = int(os.getenv("DISEASE_CAPTURE_MAX_FILES", 500))
+
+# Result cache for repeated disease images, keyed by crop, model file version
+# and image hash. MODE is "exact" (byte hash) or "perceptual" (dHash, also
+# catches recompressed/resized copies). MAX_ENTRIES=0 disables the cache.
+DISEASE_CACHE_MAX_ENTRIES = int(os.getenv("DISEASE_CACHE_MAX_ENTRIES", 2048))
+DISEASE_CACHE_TTL_SECONDS = float(os.getenv("DISEASE_CACHE_TTL_SECONDS", 900))
+DISEASE_CACHE_MODE = os.getenv("DISEASE_CACHE_MODE", "exact").lower()
+
+# Decode JPEG uploads at reduced scale near the classifier input size
+# (PIL draft mode) and apply EXIF orientation in the same pass
+DISEASE_FAST_DECODE = os.getenv("DISEASE_FAST_DECODE", "true").lower() in ("1", "true", "yes")
+
+# Maximum number of images accepted by POST /disease/predict_batch
+DISEASE_BATCH_MAX_IMAGES = int(os.getenv("DISEASE_BATCH_MAX_IMAGES", 100))
+
+# Two-tier cascade: crops listed here (or "all") that have a small
+# weights/fast.* model next to best.* answer from it when its top-1
+# confidence is at least the threshold; other images escalate to best.*
+DISEASE_CASCADE_CROPS = [c.strip() for c in os.getenv("DISEASE_CASCADE_CROPS", "").split(",") if c.strip()]
+DISEASE_CASCADE_THRESHOLD = float(os.getenv("DISEASE_CASCADE_THRESHOLD", 0.9))
+
+# Serving mode for crop disease models: "per_crop" (one network per crop) or
+# "shared" (one backbone with per-crop heads, built by train_shared_backbone.py)
+DISEASE_SERVING_MODE = os.getenv("DISEASE_SERVING_MODE", "per_crop").lower()
+DISEASE_SHARED_MODEL_PATH = os.getenv("DISEASE_SHARED_MODEL_PATH", os.path.join(os.path.dirname(__file__), 'ml_models', 'multi_crop', 'multi_crop.pt'))
+
+# crop_type=auto: a crop-identification classifier (trained by
+# train_crop_identifier.py into runs/classify/<DIR>) picks the crop first.
+# Below MIN_CONFIDENCE the user is asked to choose the crop instead.
+DISEASE_CROP_ID_MODEL_DIR = os.getenv("DISEASE_CROP_ID_MODEL_DIR", "Crop_ID_YOLO_cls")
+DISEASE_CROP_ID_MIN_CONFIDENCE = float(os.getenv("DISEASE_CROP_ID_MIN_CONFIDENCE", 0.6))
+
+# Crops (or "all") served from a quantized weights/best.int8.onnx made by
+# quantize_disease_models.py; see its report to choose. Crops without that
+# file keep using the DISEASE_INFERENCE_BACKEND weights.
+DISEASE_INT8_CROPS = [c.strip() for c in os.getenv("DISEASE_INT8_CROPS", "").split(",") if c.strip()]
+
+# Startup warmup: dummy inputs are run through every loaded disease model and
+# the irrigation model before /readyz reports ready
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+MODEL_WARMUP_ITERATIONS = int(os.getenv("MODEL_WARMUP_ITERATIONS", 2))
+# Warmup model names /readyz waits for (default: the pinned disease crops and
+# the irrigation model). Other models that fail to warm are listed as cold in
+# the /readyz body but don't block readiness; they still load on first use.
+MODEL_WARMUP_REQUIRED = [n.strip() for n in os.getenv(
+    "MODEL_WARMUP_REQUIRED", ",".join([f"disease/{c}" for c in DISEASE_MODEL_PINNED] + ["irrigation"])
+).split(",") if n.strip()]
+
+# Add a Server-Timing header with per-stage durations to /disease/predict*
+# responses (browser devtools show it); the histograms are always on /disease/metrics
+DISEASE_SERVER_TIMING = os.getenv("DISEASE_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+# Write-behind buffer for history inserts (disease predictions, assistant
+# queries): rows are committed in batches of up to FLUSH_MAX_ROWS at least
+# every FLUSH_INTERVAL_MS. When BUFFER_SIZE rows are pending, requests wait up
+# to ENQUEUE_TIMEOUT_MS and then write their own rows.
+HISTORY_WRITE_BEHIND = os.getenv("HISTORY_WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+HISTORY_FLUSH_INTERVAL_MS = float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", 200))
+HISTORY_FLUSH_MAX_ROWS = int(os.getenv("HISTORY_FLUSH_MAX_ROWS", 100))
+HISTORY_BUFFER_SIZE = int(os.getenv("HISTORY_BUFFER_SIZE", 2000))
+HISTORY_ENQUEUE_TIMEOUT_MS = float(os.getenv("HISTORY_ENQUEUE_TIMEOUT_MS", 500))
+
+# Irrigation model folder. It holds irrigation_bundle.npz (written by
+# export_irrigation_model.py) or the legacy irrigation_model.pt + *.pkl files.
+IRRIGATION_MODEL_DIR = os.getenv(
+    "IRRIGATION_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ml_models", "irrigation")
+)
+# "numpy" serves the bundle without importing PyTorch or sklearn and uses the
+# legacy files only when there is no bundle; "torch" always uses the legacy files.
+IRRIGATION_ENGINE = os.getenv("IRRIGATION_ENGINE", "numpy").lower()
+# Seconds between checks of IRRIGATION_MODEL_DIR for a new model; 0 disables hot reload
+IRRIGATION_RELOAD_INTERVAL_S = float(os.getenv("IRRIGATION_RELOAD_INTERVAL_S", 30))
+
+# Crop/soil/season names the irrigation encoders never saw: "zero" encodes
+# them as code 0 (the original behaviour), "fallback" answers those rows
+# with the rule-based estimator instead.
+IRRIGATION_UNKNOWN_CATEGORY = os.getenv("IRRIGATION_UNKNOWN_CATEGORY", "zero").lower()
+
+# Upper bound on fields per /predict_irrigation_batch request
+IRRIGATION_BATCH_MAX_FIELDS = int(os.getenv("IRRIGATION_BATCH_MAX_FIELDS", 5000))
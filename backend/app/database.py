@@ -73,6 +73,40 @@ def ensure_user_verification_columns():
     except Exception as e:
         print(f"⚠ Warning: Could not verify user columns: {str(e)[:100]}")
 
+def ensure_crop_prediction_probability_columns():
+    """Ensure the packed-probability columns (`probs_packed`, `model_version_id`) exist on `crop_predictions`."""
+    try:
+        with engine.connect() as conn:
+            for column, ddl in (
+                ('probs_packed', "ALTER TABLE crop_predictions ADD COLUMN probs_packed BLOB NULL"),
+                ('model_version_id', "ALTER TABLE crop_predictions ADD COLUMN model_version_id INT NULL"),
+            ):
+                exists = conn.execute(
+                    text("SELECT COUNT(*) FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = 'crop_predictions' AND column_name = :column"),
+                    {"column": column},
+                ).scalar()
+                if not exists:
+                    conn.execute(text(ddl))
+                    conn.commit()
+    except Exception as e:
+        print(f"⚠ Warning: Could not verify crop_predictions probability columns: {str(e)[:100]}")
+
+def ensure_crop_prediction_history_index():
+    """Ensure the `(user_id, created_at, id)` index used by paginated disease history exists.
+    create_all only adds it for new tables, so existing deployments get it here.
+    """
+    try:
+        with engine.connect() as conn:
+            index_exists = conn.execute(
+                text("SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = 'crop_predictions' AND index_name = 'ix_crop_predictions_user_created_id'")
+            ).scalar()
+            if not index_exists:
+                conn.execute(text("CREATE INDEX ix_crop_predictions_user_created_id ON crop_predictions (user_id, created_at, id)"))
+                conn.commit()
+                print("✓ Created index ix_crop_predictions_user_created_id")
+    except Exception as e:
+        print(f"⚠ Warning: Could not verify crop_predictions history index: {str(e)[:100]}")
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -1,10 +1,19 @@
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 
 # Use package-relative imports so running uvicorn from the backend folder works
 from .routes import auth, profile, crop_disease, climate, irrigation, assistant
-from . import database
+from . import database, config
+from .services.crop_disease_service import crop_disease_service
+from .services.warmup import warmup_state
+from .services.history_writer import history_writer
+from .services.probability_store import model_version_store
 app = FastAPI(title="AgroBrain Backend")
 from . import models  # Import all models to configure mappers
 
@@ -12,8 +21,12 @@ from . import models  # Import all models to configure mappers
 database.create_tables_with_retry(max_retries=3, initial_wait=2)
 
 try:
-    # ensure any new columns for users exist (helpful during deployments without alembic)
+    # ensure any new columns/indexes exist (helpful during deployments without alembic)
     database.ensure_user_verification_columns()
+    database.ensure_crop_prediction_probability_columns()
+    database.ensure_crop_prediction_history_index()
+    # cache known model versions so saving/reading history does not hit model_versions
+    model_version_store.preload()
 except Exception:
     # don't crash startup for migration helper failures; log to stdout
     import traceback
@@ -40,7 +53,58 @@ app.include_router(climate.router, prefix="/climate", tags=["Climate"])
 app.include_router(irrigation.router)
 app.include_router(assistant.router)
 
+
+@app.on_event("startup")
+def start_model_warmup():
+    # warm in the background so /healthz answers while models run their first passes
+    steps = []
+    if config.MODEL_WARMUP_ENABLED:
+        steps = [
+            ("disease", lambda: crop_disease_service.warmup(config.MODEL_WARMUP_ITERATIONS)),
+            ("irrigation", lambda: irrigation.irrigation_model_service.warmup(config.MODEL_WARMUP_ITERATIONS)),
+        ]
+    threading.Thread(target=warmup_state.run, args=(steps,), name="model-warmup", daemon=True).start()
+    # pick up new irrigation model bundles without a restart
+    irrigation.irrigation_model_service.start_watcher(config.IRRIGATION_RELOAD_INTERVAL_S)
+
+
+@app.on_event("shutdown")
+def flush_history_writes():
+    # commit history rows still buffered by the write-behind writer
+    history_writer.close()
+    irrigation.irrigation_model_service.stop_watcher()
+
+
+def _database_reachable():
+    try:
+        with database.engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True, None
+    except Exception as e:
+        return False, str(e)[:200]
+
+
 # Root
 @app.get("/")
 def root():
     return {"msg": "AgroBrain Backend Running 🚀"}
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: required models (MODEL_WARMUP_REQUIRED) warm and the database reachable; 503 until then."""
+    warmup = warmup_state.snapshot()
+    db_ok, db_error = await run_in_threadpool(_database_reachable)
+    ready = warmup["ready"] and db_ok
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "warmup": warmup,
+        "database": {"reachable": db_ok, **({"error": db_error} if db_error else {})},
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
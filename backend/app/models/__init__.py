@@ -3,6 +3,8 @@ from .assistant_query import AssistantQuery
 from .token import Token
 from .irrigation import IrrigationSchedule, IrrigationEvent, WaterUsage
 from .crop_prediction import CropPrediction
+from .model_version import ModelVersion
+from .disease_outbreak_stat import DiseaseOutbreakStat
 
 __all__ = [
 	"User",
@@ -12,4 +14,6 @@ __all__ = [
 	"IrrigationEvent",
 	"WaterUsage",
 	"CropPrediction",
+	"ModelVersion",
+	"DiseaseOutbreakStat",
 ]
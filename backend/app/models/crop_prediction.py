@@ -1,17 +1,23 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Index, LargeBinary
 from datetime import datetime
 from app.database import Base
 
 
 class CropPrediction(Base):
     __tablename__ = "crop_predictions"
+    __table_args__ = (
+        # history is listed per user, newest first, paged by (created_at, id)
+        Index("ix_crop_predictions_user_created_id", "user_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, index=True)
     crop_type = Column(String(100))
     predicted_class = Column(String(200))
     confidence = Column(Float)
-    probabilities = Column(Text, nullable=True)  # JSON string of class->probability
+    probabilities = Column(Text, nullable=True)  # legacy JSON string of class->probability (see migrate_probabilities.py)
+    probs_packed = Column(LargeBinary, nullable=True)  # float16 array in class-index order
+    model_version_id = Column(Integer, nullable=True)  # model_versions row mapping indices to class names
     recommendation = Column(Text, nullable=True)
     prevention = Column(Text, nullable=True)
     details = Column(Text, nullable=True)
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+
+
+class DiseaseOutbreakStat(Base):
+    """Prediction counts per (district, crop, predicted class, ISO week).
+
+    Best-effort aggregates so /disease/stats never scans crop_predictions:
+    update_outbreak_stats (services/outbreak_stats.py) applies them in its
+    own transaction after the CropPrediction rows commit, and only logs a
+    warning if that fails. The counts can therefore lag or miss history
+    rows; backfill_outbreak_stats.py rebuilds them from crop_predictions.
+    """
+    __tablename__ = "disease_outbreak_stats"
+    __table_args__ = (
+        UniqueConstraint("district", "crop_type", "predicted_class", "iso_week", name="uq_outbreak_district_crop_class_week"),
+        Index("ix_outbreak_week", "iso_week"),
+        Index("ix_outbreak_crop_week", "crop_type", "iso_week"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    district = Column(String(50), nullable=False, default="")  # users.district, "" when unknown
+    crop_type = Column(String(100), nullable=False)
+    predicted_class = Column(String(200), nullable=False)
+    iso_week = Column(String(8), nullable=False)  # e.g. 2026-W07
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)  # percent, for average confidence
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint
+from datetime import datetime
+from app.database import Base
+
+
+class ModelVersion(Base):
+    """Class names of one disease model version, in the model's class-index order.
+
+    CropPrediction rows store probabilities as a packed array indexed like
+    `class_names` and point here through `model_version_id`.
+    """
+    __tablename__ = "model_versions"
+    __table_args__ = (
+        UniqueConstraint("crop_type", "version", name="uq_model_versions_crop_version"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    crop_type = Column(String(100), nullable=False)
+    version = Column(String(100), nullable=False)  # weights file version, or legacy-<hash> for migrated rows
+    class_names = Column(Text, nullable=False)  # JSON list, index -> class name
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -12,11 +12,12 @@ import speech_recognition as sr
 from pydub import AudioSegment
 from gtts import gTTS
 from groq import Groq
-from app import config, database
+from app import config
 from app.utils.auth_utils import get_current_user
 from app.models.user import User
 from app.models.assistant_query import AssistantQuery
 from app.services.weather_service import get_weather, get_weather_by_coords
+from app.services.history_writer import history_writer
 from sqlalchemy.orm import Session
 from datetime import datetime
 
@@ -254,8 +255,7 @@ async def assistant_chat(req: ChatRequest, user: User = Depends(get_current_user
 
     final_output = await translate(groq_output, "en", lang) if lang != "en" else groq_output
 
-    # Save to database (safe)
-    db = database.SessionLocal()
+    # Save to database (write-behind, batched off the request path)
     try:
         assistant_query = AssistantQuery(
             user_id=user.id,
@@ -265,13 +265,9 @@ async def assistant_chat(req: ChatRequest, user: User = Depends(get_current_user
             language=lang,
             audio_url=None
         )
-        db.add(assistant_query)
-        db.commit()
+        await history_writer.submit_async(assistant_query)
     except Exception as e:
         print("DB save error:", e)
-        db.rollback()
-    finally:
-        db.close()
 
     return {"input": user_input, "response": final_output}
 
@@ -324,8 +320,7 @@ async def assistant_voice(
     audio_rel_path = await generate_audio_with_provider(final_response, language)
     audio_url = f"/static/{audio_rel_path}" if audio_rel_path else None
 
-    # Save to DB
-    db = database.SessionLocal()
+    # Save to DB (write-behind, batched off the request path)
     try:
         assistant_query = AssistantQuery(
             user_id=user.id,
@@ -335,13 +330,9 @@ async def assistant_voice(
             language=language,
             audio_url=audio_url
         )
-        db.add(assistant_query)
-        db.commit()
+        await history_writer.submit_async(assistant_query)
     except Exception as e:
         print("DB save error:", e)
-        db.rollback()
-    finally:
-        db.close()
 
     return {
         "user_voice_text": user_text,
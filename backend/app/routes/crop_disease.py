@@ -1,118 +1,396 @@
-from fastapi import APIRouter, Form, Depends
-from sqlalchemy.orm import Session
+import asyncio
+import json
+import time
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Form, File, UploadFile, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session, defer
+from .. import config
 from ..services.crop_disease_service import crop_disease_service
+from ..services.inference_executor import inference_executor, ExecutorSaturated
+from ..services.stage_timing import StageTimer, disease_latency
+from ..services.history_writer import history_writer
+from ..services.outbreak_stats import week_range
+from ..services.model_registry import CROP_MODEL_DIRS
+from ..services.probability_store import model_version_store, pack_probabilities, legacy_version
 from ..models.user import User
-from ..models import CropPrediction
+from ..models import CropPrediction, DiseaseOutbreakStat
 from ..database import get_db
 from ..utils.auth_utils import get_current_user
 
 router = APIRouter()
 
+ACCEPTED_IMAGE_TYPES = {"image/jpeg", "image/jpg", "image/png", "image/webp", "application/octet-stream"}
+
+
+def _build_prediction_row(crop_type: str, result: dict, user_id: int):
+    """Build the CropPrediction history row for a successful prediction, else None."""
+    if "predicted_class" not in result or "confidence" not in result:
+        return None
+
+    disease_name = result["predicted_class"]
+    confidence = result["confidence"]
+
+    # Convert confidence to percentage if it's in 0-1 range
+    try:
+        conf_float = float(confidence) if confidence is not None else 0.0
+        if conf_float <= 1.0:
+            conf_float = conf_float * 100.0
+    except (TypeError, ValueError):
+        conf_float = 0.0
+
+    details = f"Disease prediction for {crop_type.title()}: {disease_name} ({conf_float:.1f}% confidence)"
+
+    # store probabilities as a float16 array; the class names live once per model version
+    packed = version_id = None
+    probs = result.get("probabilities")
+    if isinstance(probs, dict) and probs:
+        try:
+            version = crop_disease_service.model_version(crop_type.lower()) or legacy_version(probs.keys())
+            version_id = model_version_store.resolve(crop_type.lower(), version, probs.keys())
+            packed = pack_probabilities(list(probs.values()))
+        except Exception as e:
+            print("Could not pack probabilities:", e)
+            packed = version_id = None
+
+    return CropPrediction(
+        user_id=user_id,
+        crop_type=crop_type.lower(),
+        predicted_class=disease_name,
+        confidence=conf_float,
+        probs_packed=packed,
+        model_version_id=version_id,
+        recommendation=result.get("recommendation") or (result.get("recommendation") if isinstance(result.get("recommendation"), str) else None),
+        prevention=result.get("prevention"),
+        details=details
+    )
+
+
+def _build_prediction_rows(crop_type: str, results, user_id: int):
+    rows = (_build_prediction_row(result.get("crop_type", crop_type), result, user_id) for result in results)
+    return [row for row in rows if row is not None]
+
+
+async def _predict_and_save(crop_type: str, image_data, current_user: User, response: Response):
+    timer = StageTimer()
+    try:
+        # Decode + inference run on the bounded inference executor, not the event loop
+        result = await inference_executor.run(crop_disease_service.predict, crop_type.lower(), image_data, timer)
+    except ExecutorSaturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Disease prediction is busy, please retry shortly",
+            headers={"Retry-After": str(config.DISEASE_RETRY_AFTER_SECONDS)},
+        )
+    except Exception as e:
+        return {"error": str(e)}
+
+    try:
+        # Save prediction to history (crop_type=auto results carry the identified crop)
+        crop_type = result.get("crop_type", crop_type)
+        with timer.stage('serialize'):
+            # off the event loop: a model version not seen yet is registered in the database
+            pred = await run_in_threadpool(_build_prediction_row, crop_type, result, current_user.id)
+        if pred is not None:
+            # write-behind: the insert is batched with other history rows off the request path
+            with timer.stage('history_enqueue'):
+                await history_writer.submit_async(pred)
+
+        return {"crop_type": crop_type, **result}
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        timer.add('total', (time.monotonic() - timer.created) * 1000)
+        # unknown crop strings share one series so clients cannot grow the histograms
+        crop_key = crop_type.lower()
+        disease_latency.observe(crop_key if crop_key in CROP_MODEL_DIRS else "other", timer.stages)
+        if config.DISEASE_SERVER_TIMING:
+            response.headers["Server-Timing"] = timer.server_timing()
+
+
 @router.post("/predict")
 async def predict_disease(
+    response: Response,
     crop_type: str = Form(...),
     file: str = Form(...),
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    try:
-        # Make prediction using the service with base64 image data
-        result = crop_disease_service.predict(crop_type.lower(), file)
-
-        # Save prediction to history
-        if "predicted_class" in result and "confidence" in result:
-            disease_name = result["predicted_class"]
-            confidence = result["confidence"]
-            
-            # Convert confidence to percentage if it's in 0-1 range
+    """Predict from a base64-encoded image (kept for older app versions).
+
+    `crop_type` may be "auto" to identify the crop from the image first.
+    """
+    return await _predict_and_save(crop_type, file, current_user, response)
+
+
+@router.post("/predict_image")
+async def predict_disease_image(
+    response: Response,
+    crop_type: str = Form(...),
+    image: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Predict from a raw JPEG/PNG multipart upload, without base64 inflation.
+
+    `crop_type` may be "auto" to identify the crop from the image first.
+    """
+    if image.content_type and image.content_type.lower() not in ACCEPTED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported image type '{image.content_type}'")
+    # single read of the upload; PIL decodes straight from these bytes
+    image_bytes = await image.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    return await _predict_and_save(crop_type, image_bytes, current_user, response)
+
+
+@router.post("/predict_batch")
+async def predict_disease_batch(
+    crop_types: List[str] = Form(...),
+    images: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Predict many images in one request, e.g. a field survey.
+
+    `crop_types` is either one crop for all images or one per image (crops may
+    be mixed; "auto" identifies the crop of each image). Images are grouped by crop and each group runs batched inference
+    on the inference executor, in chunks of DISEASE_BATCH_MAX_SIZE images.
+    Results stream back as NDJSON, one line per image as its chunk
+    completes, followed by a summary line. Each chunk's history rows are
+    handed to the write-behind history writer as soon as the chunk
+    completes, so a client that disconnects mid-stream does not lose them.
+    """
+    if len(images) > config.DISEASE_BATCH_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {config.DISEASE_BATCH_MAX_IMAGES} images per batch")
+    if len(crop_types) not in (1, len(images)):
+        raise HTTPException(status_code=422, detail="Provide one crop_type for all images or one per image")
+
+    crops = [c.lower() for c in (crop_types * len(images) if len(crop_types) == 1 else crop_types)]
+    blobs = []
+    for image in images:
+        if image.content_type and image.content_type.lower() not in ACCEPTED_IMAGE_TYPES:
+            raise HTTPException(status_code=415, detail=f"Unsupported image type '{image.content_type}' for {image.filename}")
+        blobs.append(await image.read())
+
+    groups = {}
+    for i, crop in enumerate(crops):
+        groups.setdefault(crop, []).append(i)
+
+    user_id = current_user.id
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+    chunk_size = max(1, config.DISEASE_BATCH_MAX_SIZE)
+
+    def _predict_group(crop, idxs):
+        # one executor job per crop group; each chunk is streamed and saved as it completes
+        for start in range(0, len(idxs), chunk_size):
+            chunk = idxs[start:start + chunk_size]
             try:
-                conf_float = float(confidence) if confidence is not None else 0.0
-                if conf_float <= 1.0:
-                    conf_float = conf_float * 100.0
-            except (TypeError, ValueError):
-                conf_float = 0.0
-            
-            details = f"Disease prediction for {crop_type.title()}: {disease_name} ({conf_float:.1f}% confidence)"
-
-            # store probabilities as JSON string where available
+                results = crop_disease_service.predict_many(crop, [blobs[i] for i in chunk])
+            except Exception as e:
+                results = [{"error": f"Prediction failed: {str(e)}"} for _ in chunk]
+            saved = 0
             try:
-                import json
-                prob_str = json.dumps(result.get("probabilities")) if result.get("probabilities") is not None else None
-            except Exception:
-                prob_str = None
-
-            pred = CropPrediction(
-                user_id=current_user.id,
-                crop_type=crop_type.lower(),
-                predicted_class=disease_name,
-                confidence=conf_float,
-                probabilities=prob_str,
-                recommendation=result.get("recommendation") or (result.get("recommendation") if isinstance(result.get("recommendation"), str) else None),
-                prevention=result.get("prevention"),
-                details=details
-            )
-            db.add(pred)
-            db.commit()
+                rows = _build_prediction_rows(crop, results, user_id)
+                history_writer.submit(rows)
+                saved = len(rows)
+            except Exception as e:
+                print("DB save error:", e)
+            loop.call_soon_threadsafe(chunks.put_nowait, (crop, chunk, results, saved))
+
+    # submit every crop group up front so a saturated executor is a clean 503
+    futures = {}
+    try:
+        for crop, idxs in groups.items():
+            futures[crop] = inference_executor.submit(_predict_group, crop, idxs)
+    except ExecutorSaturated:
+        for f in futures.values():
+            f.cancel()
+        raise HTTPException(
+            status_code=503,
+            detail="Disease prediction is busy, please retry shortly",
+            headers={"Retry-After": str(config.DISEASE_RETRY_AFTER_SECONDS)},
+        )
+
+    filenames = [image.filename for image in images]
+
+    async def stream():
+        remaining, saved = len(images), 0
+        while remaining:
+            crop, chunk, results, chunk_saved = await chunks.get()
+            remaining -= len(chunk)
+            saved += chunk_saved
+            for i, result in zip(chunk, results):
+                yield json.dumps({"index": i, "filename": filenames[i], "crop_type": crop, **result}) + "\n"
+        yield json.dumps({"done": True, "total": len(images), "saved": saved}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
-        return {"crop_type": crop_type, **result}
-    except Exception as e:
-        return {"error": str(e)}
+
+def _decode_probabilities(pred: CropPrediction):
+    """{class: probability} from the packed array, or from legacy JSON rows not yet migrated."""
+    if pred.probs_packed is not None and pred.model_version_id is not None:
+        return model_version_store.decode(pred.probs_packed, pred.model_version_id)
+    try:
+        return json.loads(pred.probabilities) if pred.probabilities else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_history_cursor(before: str):
+    """Parse a `<created_at ISO>,<id>` cursor as returned in `next_before`."""
+    try:
+        created_at, _, pred_id = before.rpartition(",")
+        return datetime.fromisoformat(created_at), int(pred_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'before' cursor, expected '<created_at>,<id>'")
 
 
 @router.get("/history")
 async def get_prediction_history(
+    before: Optional[str] = Query(None, description="cursor from a previous page's next_before"),
+    limit: int = Query(100, ge=1, le=100),
+    include_probabilities: bool = Query(False, description="also decode each row's class probabilities"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    """Newest-first prediction history, paged by (created_at, id).
+
+    Each page is one index range scan on (user_id, created_at, id), so its
+    cost depends on `limit`, not on how much history the user has. Pass the
+    returned `next_before` as `before` for the next page (null on the last).
+    Stored probabilities are only unpacked with include_probabilities=true.
+    """
+    cursor = _parse_history_cursor(before) if before else None
     try:
-        # Debug: print current user id for troubleshooting empty history
-        try:
-            print(f"[crop_disease.history] current_user.id={current_user.id}")
-        except Exception:
-            print("[crop_disease.history] current_user id not available")
-        import json
-        preds = db.query(CropPrediction).filter(CropPrediction.user_id == current_user.id).order_by(CropPrediction.created_at.desc()).limit(100).all()
-        try:
-            print(f"[crop_disease.history] query returned {len(preds)} predictions")
-            # optionally print first few ids
-            ids = [p.id for p in preds]
-            print(f"[crop_disease.history] prediction ids: {ids}")
-        except Exception:
-            pass
+        query = db.query(CropPrediction).filter(CropPrediction.user_id == current_user.id)
+        if cursor is not None:
+            created_at, pred_id = cursor
+            query = query.filter(or_(
+                CropPrediction.created_at < created_at,
+                and_(CropPrediction.created_at == created_at, CropPrediction.id < pred_id),
+            ))
+        if not include_probabilities:
+            query = query.options(
+                defer(CropPrediction.probabilities),
+                defer(CropPrediction.probs_packed),
+                defer(CropPrediction.model_version_id),
+            )
+        # one extra row tells us whether another page exists
+        preds = query.order_by(CropPrediction.created_at.desc(), CropPrediction.id.desc()).limit(limit + 1).all()
+        has_more = len(preds) > limit
+        preds = preds[:limit]
+
         out = []
         for p in preds:
-            probs = None
-            try:
-                prob_str = str(p.probabilities) if p.probabilities is not None else None
-                if prob_str and isinstance(prob_str, str):
-                    probs = json.loads(prob_str)
-            except Exception:
-                probs = None
-
-            created_at_str = None
-            try:
-                if p.created_at is not None:
-                    created_at_str = p.created_at.isoformat()
-            except Exception:
-                pass
-
-            out.append({
+            item = {
                 "id": p.id,
                 "crop_type": p.crop_type,
                 "predicted_class": p.predicted_class,
                 "confidence": p.confidence,
-                "probabilities": probs,
                 "recommendation": p.recommendation,
                 "prevention": p.prevention,
                 "details": p.details,
-                "created_at": created_at_str,
-            })
+                "created_at": p.created_at.isoformat() if p.created_at is not None else None,
+            }
+            if include_probabilities:
+                item["probabilities"] = _decode_probabilities(p)
+            out.append(item)
 
-        return {"predictions": out}
+        next_before = None
+        if has_more and preds and preds[-1].created_at is not None:
+            next_before = f"{preds[-1].created_at.isoformat()},{preds[-1].id}"
+        return {"predictions": out, "next_before": next_before}
     except Exception as e:
         return {"error": str(e)}
 
+def _stats_filters(query, district, crop_type, predicted_class, weeks):
+    first_week, last_week = week_range(weeks)
+    query = query.filter(DiseaseOutbreakStat.iso_week >= first_week, DiseaseOutbreakStat.iso_week <= last_week)
+    if district:
+        query = query.filter(DiseaseOutbreakStat.district == district.strip())
+    if crop_type:
+        query = query.filter(DiseaseOutbreakStat.crop_type == crop_type.lower())
+    if predicted_class:
+        query = query.filter(DiseaseOutbreakStat.predicted_class == predicted_class)
+    return query
+
+
+@router.get("/stats")
+def get_disease_stats(
+    district: Optional[str] = None,
+    crop_type: Optional[str] = None,
+    predicted_class: Optional[str] = None,
+    weeks: int = Query(4, ge=1, le=104),
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Prediction counts per district, crop, disease and ISO week over the last `weeks` weeks.
+
+    Reads only the disease_outbreak_stats aggregates, never crop_predictions.
+    """
+    rows = _stats_filters(db.query(DiseaseOutbreakStat), district, crop_type, predicted_class, weeks) \
+        .order_by(DiseaseOutbreakStat.iso_week.desc(), DiseaseOutbreakStat.count.desc()) \
+        .limit(limit).all()
+    return {"stats": [{
+        "district": r.district,
+        "crop_type": r.crop_type,
+        "predicted_class": r.predicted_class,
+        "iso_week": r.iso_week,
+        "count": r.count,
+        "avg_confidence": round(r.confidence_sum / r.count, 1) if r.count else None,
+    } for r in rows]}
+
+
+@router.get("/stats/top")
+def get_top_disease_stats(
+    group_by: str = Query("district", pattern="^(district|crop_type|predicted_class)$"),
+    district: Optional[str] = None,
+    crop_type: Optional[str] = None,
+    predicted_class: Optional[str] = None,
+    weeks: int = Query(4, ge=1, le=104),
+    limit: int = Query(20, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Totals over the last `weeks` weeks grouped by district, crop or disease, largest first.
+
+    e.g. ?group_by=district&predicted_class=Rice___Brown_Spot for outbreak hot spots.
+    """
+    column = getattr(DiseaseOutbreakStat, group_by)
+    total = func.sum(DiseaseOutbreakStat.count)
+    query = db.query(column, total, func.sum(DiseaseOutbreakStat.confidence_sum))
+    rows = _stats_filters(query, district, crop_type, predicted_class, weeks) \
+        .group_by(column).order_by(total.desc()).limit(limit).all()
+    return {"group_by": group_by, "weeks": weeks, "stats": [{
+        group_by: key,
+        "count": int(count or 0),
+        "avg_confidence": round(float(conf_sum) / count, 1) if count else None,
+    } for key, count, conf_sum in rows]}
+
+
 @router.get("/crops")
 async def get_available_crops():
-    crops = list(crop_disease_service.models.keys())
-    return {"crops": crops}
+    crops = crop_disease_service.available_crops()
+    # "auto" is accepted as crop_type when the crop identifier model is present
+    auto = bool(crop_disease_service.crop_id_registry.available())
+    return {"crops": crops, "auto": auto}
+
+
+@router.get("/metrics")
+async def get_disease_metrics():
+    batcher = crop_disease_service.batcher
+    return {
+        "models": crop_disease_service.registry.stats(),
+        "batching": batcher.stats() if batcher is not None else {"enabled": False},
+        "executor": inference_executor.stats(),
+        "capture": crop_disease_service.capture.stats(),
+        "cache": crop_disease_service.cache.stats(),
+        "cascade": crop_disease_service.cascade_stats(),
+        "fast_models": crop_disease_service.fast_registry.stats(),
+        "crop_identification": crop_disease_service.crop_id_stats(),
+        "latency": disease_latency.snapshot(),
+        "history_writer": history_writer.stats(),
+    }
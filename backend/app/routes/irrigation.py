@@ -6,6 +6,7 @@ import csv
 import os
 
 # Use package-relative imports
+from .. import config
 from ..services.irrigation_model_service import IrrigationModelService
 from ..services.weather_service import get_weather
 from ..services import generative_service
@@ -16,8 +17,8 @@ from ..utils.auth_utils import get_current_user
 
 router = APIRouter()
 
-# Load model once (update path as needed)
-irrigation_model_service = IrrigationModelService("x:/KrishiBandhu/Training/irrigation/irrigation_model.pt")
+# Load model once; IRRIGATION_MODEL_DIR points at the bundle (or legacy files)
+irrigation_model_service = IrrigationModelService(config.IRRIGATION_MODEL_DIR)
 
 # Helper to read training CSV for metadata (crop and soil types)
 _metadata_cache = {}
@@ -164,22 +165,22 @@ def predict_irrigation(
         # Make prediction
         prediction = irrigation_model_service.predict(input_data)
         
-        # Generate day-wise water requirements
-        day_wise_payload = {
-            'prediction': prediction,
-            'weather': weather,
-            'crop_type': crop_type,
-            'soil_type': soil_type,
-            'soil_moisture': soil_moisture,
-            'temperature': temperature_c,
-            'field_area': field_area_hectare
-        }
-        day_wise_requirements = generative_service.generate_day_wise_water_requirements(day_wise_payload)
+        # Day-wise water requirements: one row per forecast day (soil moisture
+        # carried forward), all classified in a single batched model call.
+        # Without a forecast, spread the prediction over the week instead.
+        forecast = weather.get('forecast') if isinstance(weather, dict) else None
+        if forecast:
+            day_wise_requirements = irrigation_model_service.predict_forecast(input_data, forecast)
+        else:
+            day_wise_requirements = generative_service.generate_day_wise_water_requirements(
+                {"prediction": prediction, "weather": weather}
+            )
         
         # Return comprehensive prediction result
         return {
             "success": True,
             "prediction": prediction,
+            "model_version": prediction.get('model_version'),
             "weather": weather,
             "day_wise_requirements": day_wise_requirements,
             "sensor_data": {
@@ -203,9 +204,30 @@ def predict_irrigation(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/predict_irrigation_batch")
+def predict_irrigation_batch(
+    payload: dict = Body(...),
+    user: User = Depends(get_current_user),
+):
+    """
+    Irrigation need for many fields in one call, e.g. all fields of a cooperative.
+    Body: {"fields": [{crop_type, soil_type, season, soil_moisture, temperature, humidity,
+    rainfall, sunlight_hours, wind_speed, area, previous_irrigation}, ...]}
+    No weather or IoT lookups are made; missing values take the model defaults.
+    Predictions are returned in the same order as the fields.
+    """
+    fields = payload.get('fields')
+    if not isinstance(fields, list) or not all(isinstance(f, dict) for f in fields):
+        raise HTTPException(status_code=400, detail="'fields' must be a list of objects")
+    if len(fields) > config.IRRIGATION_BATCH_MAX_FIELDS:
+        raise HTTPException(status_code=413, detail=f"At most {config.IRRIGATION_BATCH_MAX_FIELDS} fields per batch")
+    predictions = irrigation_model_service.predict_batch(fields)
+    return {"success": True, "model_version": irrigation_model_service.model_version, "predictions": predictions}
+
+
 @router.get("/irrigation/metadata")
 def irrigation_metadata():
-    return _load_metadata()
+    return {**_load_metadata(), "model": irrigation_model_service.stats()}
 
 
 @router.get("/irrigation/schedules")
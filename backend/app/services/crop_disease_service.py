@@ -3,66 +3,166 @@ import io
 import base64
 import os
 import csv
-import re
 import json
-from ultralytics import YOLO
+import logging
+import threading
+import time
+from app import config
+from app.services.model_registry import ModelRegistry, SharedBackboneRegistry, MODELS_BASE_PATH, CROP_MODEL_DIRS, CROP_ID_KEY
+from app.services.inference_backends import get_backend, SharedBackboneModel, PreparedImage, OnnxModel, INT8_WEIGHTS_FILE
+from app.services.inference_batcher import MicroBatcher
+from app.services.image_capture import ImageCapture
+from app.services.disease_index import DiseaseIndex, normalize
+from app.services.result_cache import PredictionCache
+from app.services.image_preprocessing import decode_image
+from app.services.stage_timing import timed
+
+logger = logging.getLogger(__name__)
 
 class CropDiseaseService:
     def __init__(self):
-        self.models = {}
-        self.class_names = {}
         self.recommendations = {}
         self.analysis = {}
+        self._recommendation_index = DiseaseIndex({})
+        self._analysis_index = DiseaseIndex({})
+        self._missing_recommendations = set()
+        self.cache = PredictionCache(
+            max_entries=config.DISEASE_CACHE_MAX_ENTRIES,
+            ttl_seconds=config.DISEASE_CACHE_TTL_SECONDS,
+            mode=config.DISEASE_CACHE_MODE,
+        )
         self._load_models()
+        self.batcher = None
+        if config.DISEASE_BATCH_ENABLED:
+            # batches are keyed by (crop_type, tier)
+            self.batcher = MicroBatcher(
+                lambda key, images: self._run_model_batch(key[0], images, tier=key[1]),
+                max_batch_size=config.DISEASE_BATCH_MAX_SIZE,
+                max_wait_ms=config.DISEASE_BATCH_MAX_WAIT_MS,
+            )
+        self.capture = ImageCapture(
+            config.DISEASE_CAPTURE_DIR,
+            sample_rate=config.DISEASE_CAPTURE_SAMPLE_RATE,
+            max_files=config.DISEASE_CAPTURE_MAX_FILES,
+        )
         self._load_recommendations()
         self._load_analysis()
 
     def _load_models(self):
-        # Base path for YOLO models
-        base_path = os.path.join(os.path.dirname(__file__), '..', 'ml_models', 'runs', 'classify')
-
-        # Mapping of crop types to YOLO model directories
-        crop_dirs = {
-            'apple': 'Apple_YOLO_cls',
-            'banana': 'Banana_YOLO_cls',
-            'black_gram': 'Black_Gram_YOLO_cls',
-            'brinjal': 'Brinjal_YOLO_cls',
-            'cherry': 'Cherry_YOLO_cls',
-            'chilli': 'Chilli_YOLO_cls',
-            'corn': 'Corn_YOLO_cls',
-            'grape': 'Grape_YOLO_cls',
-            'pepper_bell': 'Pepper_bell_YOLO_cls',
-            'potato': 'Potato_YOLO_cls',
-            'rice': 'Rice_YOLO_cls',
-            'soybean': 'Soybean_YOLO_cls',
-            'strawberry': 'Strawberry_YOLO_cls',
-            'sugarcane': 'Sugarcane_YOLO_cls',
-            'tomato': 'Tomato_YOLO_cls',
-            'wheat': 'Wheat_YOLO_cls'
-        }
-
-        for crop, dir_name in crop_dirs.items():
-            model_path = os.path.join(base_path, dir_name, 'weights', 'best.pt')
-            if os.path.exists(model_path):
-                try:
-                    # Load YOLO model
-                    model = YOLO(model_path)
-                    self.models[crop] = model
-                    self.class_names[crop] = model.names
-                    print(f"Loaded YOLO model for {crop} with {len(model.names)} classes: {list(model.names.values())}")
-                except Exception as e:
-                    print(f"Error loading YOLO model for {crop}: {e}")
-            else:
-                print(f"YOLO model file not found for {crop}: {model_path}")
-
-    def preprocess_image(self, image_data):
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data)
-        # Save decoded image for debugging
-        debug_image_path = os.path.join(os.path.dirname(__file__), '..', 'decoded_test_image.jpg')
-        with open(debug_image_path, 'wb') as f:
-            f.write(image_bytes)
-
+        backend = get_backend(config.DISEASE_INFERENCE_BACKEND)
+        # Per-crop switch to int8 ONNX weights, driven by DISEASE_INT8_CROPS
+        int8_crops = list(CROP_MODEL_DIRS) + [CROP_ID_KEY] if config.DISEASE_INT8_CROPS == ['all'] else config.DISEASE_INT8_CROPS
+        int8_overrides = {crop: (INT8_WEIGHTS_FILE, OnnxModel) for crop in int8_crops}
+
+        if config.DISEASE_SERVING_MODE == 'shared':
+            # One resident backbone with a head per crop serves every crop
+            self.registry = SharedBackboneRegistry(
+                config.DISEASE_SHARED_MODEL_PATH,
+                loader=SharedBackboneModel,
+                on_change=self.cache.invalidate_crop,
+                check_interval=config.DISEASE_MODEL_CHECK_INTERVAL_S,
+            )
+        else:
+            # Models are loaded on first use; only pinned crops are loaded up front
+            self.registry = ModelRegistry(
+                MODELS_BASE_PATH,
+                CROP_MODEL_DIRS,
+                loader=backend,
+                weights_file=backend.weights_file,
+                max_models=config.DISEASE_MODEL_MAX_RESIDENT,
+                max_mb=config.DISEASE_MODEL_MAX_MB,
+                pinned=config.DISEASE_MODEL_PINNED,
+                on_change=self.cache.invalidate_crop,
+                overrides=int8_overrides,
+                check_interval=config.DISEASE_MODEL_CHECK_INTERVAL_S,
+            )
+        self.registry.preload_pinned()
+        print(f"Crop disease models ({config.DISEASE_SERVING_MODE}, {config.DISEASE_INFERENCE_BACKEND}) available: {self.registry.available()} (resident: {self.registry.resident()})")
+
+        # Optional two-tier cascade: a small weights/fast.* model answers confident
+        # images and only uncertain ones go on to the full best.* model
+        fast_weights = 'fast' + os.path.splitext(backend.weights_file)[1]
+        self.fast_registry = ModelRegistry(
+            MODELS_BASE_PATH,
+            CROP_MODEL_DIRS,
+            loader=backend,
+            weights_file=fast_weights,
+            max_models=config.DISEASE_MODEL_MAX_RESIDENT,
+            max_mb=config.DISEASE_MODEL_MAX_MB,
+            pinned=config.DISEASE_MODEL_PINNED,
+            on_change=self.cache.invalidate_crop,
+            check_interval=config.DISEASE_MODEL_CHECK_INTERVAL_S,
+        )
+        self.cascade_crops = set(self.fast_registry.available())
+        if config.DISEASE_CASCADE_CROPS != ['all']:
+            self.cascade_crops &= set(config.DISEASE_CASCADE_CROPS)
+        self._cascade_lock = threading.Lock()
+        self._cascade_counts = {}  # crop -> {'fast': n, 'escalated': n}
+        self._cascade_disabled = set()  # crops whose fast model has different classes
+        if self.cascade_crops:
+            print(f"Crop disease cascade enabled for {sorted(self.cascade_crops)} (threshold {config.DISEASE_CASCADE_THRESHOLD})")
+
+        # Crop identifier for crop_type=auto, kept resident once loaded
+        self.crop_id_registry = ModelRegistry(
+            MODELS_BASE_PATH,
+            {CROP_ID_KEY: config.DISEASE_CROP_ID_MODEL_DIR},
+            loader=backend,
+            weights_file=backend.weights_file,
+            pinned=[CROP_ID_KEY],
+            overrides=int8_overrides,
+            check_interval=config.DISEASE_MODEL_CHECK_INTERVAL_S,
+        )
+        self.crop_id_registry.preload_pinned()
+        self._crop_id_lock = threading.Lock()
+        self._crop_id_counts = {'identified': 0, 'uncertain': 0}
+
+    def available_crops(self):
+        return self.registry.available()
+
+    def warmup(self, iterations=2):
+        """Run dummy images through every loaded model so first requests skip lazy init.
+
+        Covers the resident disease models (every crop in shared mode), the
+        cascade fast models and the crop identifier, at batch size 1 and at the
+        micro-batch size. Returns {model name: {"warm", "seconds"[, "error"]}}.
+        """
+        if isinstance(self.registry, SharedBackboneRegistry):
+            targets = [(f"disease/{crop}", self.registry, crop) for crop in self.registry.available()]
+        else:
+            targets = [(f"disease/{crop}", self.registry, crop) for crop in self.registry.resident()]
+        targets += [(f"disease_fast/{crop}", self.fast_registry, crop) for crop in self.fast_registry.resident()]
+        targets += [("crop_identifier", self.crop_id_registry, crop) for crop in self.crop_id_registry.resident()]
+
+        statuses = {}
+        for name, registry, crop in targets:
+            started = time.monotonic()
+            try:
+                model = registry.get(crop)
+                if model is None:
+                    raise RuntimeError(f"model for '{crop}' not available")
+                image = Image.new('RGB', (model.imgsz, model.imgsz), (96, 128, 64))
+                for _ in range(max(1, iterations)):
+                    model.predict([image])
+                if config.DISEASE_BATCH_MAX_SIZE > 1:
+                    model.predict([image] * config.DISEASE_BATCH_MAX_SIZE)
+                statuses[name] = {"warm": True, "seconds": round(time.monotonic() - started, 3)}
+            except Exception as e:
+                print(f"Warmup failed for {name}: {e}")
+                statuses[name] = {"warm": False, "seconds": round(time.monotonic() - started, 3), "error": str(e)}
+        return statuses
+
+    def _image_bytes(self, image_data):
+        # Raw bytes come from multipart uploads; strings are the legacy base64 form field
+        if isinstance(image_data, (bytes, bytearray, memoryview)):
+            return image_data
+        with timed('base64_decode'):
+            return base64.b64decode(image_data)
+
+    def preprocess_image(self, image_data, target_size=None):
+        image_bytes = self._image_bytes(image_data)
+        if config.DISEASE_FAST_DECODE:
+            # decode near the model input size, upright and without EXIF
+            return decode_image(image_bytes, target_size)
         # Open image as PIL Image
         image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
         return image
@@ -76,15 +176,6 @@ class CropDiseaseService:
                 print(f"Recommendations CSV not found at {csv_path}")
                 return
 
-            def normalize(s: str) -> str:
-                s = s or ''
-                s = s.strip().lower()
-                # replace non-alphanumeric with underscore
-                s = re.sub(r'[^a-z0-9]+', '_', s)
-                # collapse multiple underscores
-                s = re.sub(r'_+', '_', s).strip('_')
-                return s
-
             with open(csv_path, newline='', encoding='utf-8') as f:
                 reader = csv.DictReader(f)
                 for row in reader:
@@ -107,6 +198,7 @@ class CropDiseaseService:
                             'recommendation': recommendation,
                             'prevention': prevention
                         }
+            self._recommendation_index = DiseaseIndex(self.recommendations)
             print(f"Loaded {len(self.recommendations)} recommendation entries from CSV")
         except Exception as e:
             print(f"Failed to load recommendations CSV: {e}")
@@ -123,13 +215,6 @@ class CropDiseaseService:
             with open(json_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
 
-            def normalize(s: str) -> str:
-                s = s or ''
-                s = s.strip().lower()
-                s = re.sub(r'[^a-z0-9]+', '_', s)
-                s = re.sub(r'_+', '_', s).strip('_')
-                return s
-
             for key, val in data.items():
                 if not key:
                     continue
@@ -141,146 +226,393 @@ class CropDiseaseService:
                 if disease_name:
                     self.analysis[normalize(disease_name)] = val
 
+            self._analysis_index = DiseaseIndex(self.analysis)
             print(f"Loaded {len(self.analysis)} analysis entries from JSON")
         except Exception as e:
             print(f"Failed to load disease analysis JSON: {e}")
 
-    def predict(self, crop_type, image_data):
-        if crop_type not in self.models:
+    def _run_model_batch(self, crop_type, images, tier='full'):
+        """Run one forward pass over `images` and return per-image probability lists."""
+        if tier == CROP_ID_KEY:
+            registry = self.crop_id_registry
+        else:
+            registry = self.fast_registry if tier == 'fast' else self.registry
+        model = registry.get(crop_type)
+        if model is None:
+            raise RuntimeError(f"YOLO model for crop '{crop_type}' ({tier}) not available")
+        return model.predict(images)
+
+    def _infer(self, crop_type, image, tier='full'):
+        if self.batcher is not None:
+            return self.batcher.submit((crop_type, tier), image).result()
+        return self._run_model_batch(crop_type, [image], tier=tier)[0]
+
+    def model_version(self, crop_type):
+        """Version tag of the weights currently serving `crop_type` (cascade: full+fast)."""
+        version = self.registry.model_version(crop_type)
+        if crop_type in self.cascade_crops:
+            version = f"{version}+{self.fast_registry.model_version(crop_type)}"
+        return version
+
+    def _use_cascade(self, crop_type, full_model):
+        if crop_type not in self.cascade_crops or crop_type in self._cascade_disabled:
+            return False
+        fast_model = self.fast_registry.get(crop_type)
+        if fast_model is None:
+            return False
+        if fast_model.names != full_model.names:
+            print(f"Cascade disabled for {crop_type}: fast model classes differ from the full model")
+            self._cascade_disabled.add(crop_type)
+            return False
+        return True
+
+    def _record_tier(self, crop_type, tier):
+        with self._cascade_lock:
+            counts = self._cascade_counts.setdefault(crop_type, {'fast': 0, 'escalated': 0})
+            counts['fast' if tier == 'fast' else 'escalated'] += 1
+
+    def _classify(self, crop_type, model, image):
+        """Return (probs, tier) for one image, going through the cascade when enabled."""
+        if self._use_cascade(crop_type, model):
+            probs = self._infer(crop_type, image, tier='fast')
+            if probs is not None and max(probs) >= config.DISEASE_CASCADE_THRESHOLD:
+                self._record_tier(crop_type, 'fast')
+                return probs, 'fast'
+            self._record_tier(crop_type, 'full')
+        return self._infer(crop_type, image), 'full'
+
+    def _classify_batch(self, crop_type, model, images):
+        """Batched `_classify`: one fast pass, then one full pass over the uncertain images."""
+        results = [None] * len(images)
+        remaining = list(range(len(images)))
+        if self._use_cascade(crop_type, model):
+            fast_probs = self._run_model_batch(crop_type, images, tier='fast')
+            remaining = []
+            for i, probs in enumerate(fast_probs):
+                if probs is not None and max(probs) >= config.DISEASE_CASCADE_THRESHOLD:
+                    results[i] = (probs, 'fast')
+                    self._record_tier(crop_type, 'fast')
+                else:
+                    remaining.append(i)
+                    self._record_tier(crop_type, 'full')
+        if remaining:
+            full_probs = self._run_model_batch(crop_type, [images[i] for i in remaining])
+            for i, probs in zip(remaining, full_probs):
+                results[i] = (probs, 'full')
+        return results
+
+    def cascade_stats(self):
+        with self._cascade_lock:
+            per_crop = {}
+            for crop, counts in self._cascade_counts.items():
+                total = counts['fast'] + counts['escalated']
+                per_crop[crop] = dict(counts, escalation_rate=round(counts['escalated'] / total, 4) if total else 0.0)
+            return {
+                "crops": sorted(self.cascade_crops - self._cascade_disabled),
+                "threshold": config.DISEASE_CASCADE_THRESHOLD,
+                "per_crop": per_crop,
+            }
+
+    def _lookup_or_decode(self, crop_type, model, image_bytes, image=None):
+        """Return (cached_response, None, cache_key) on a cache hit, else (None, image, cache_key).
+
+        `image` is an already decoded upload (a PreparedImage for crop_type=auto)
+        and is returned as-is instead of decoding again.
+        """
+        # Repeated uploads of the same image are answered from the result cache
+        cache_key = None
+        if self.cache.enabled and self.cache.mode == 'exact':
+            with timed('cache'):
+                cache_key = self.cache.exact_key(crop_type, self.model_version(crop_type), image_bytes)
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached, None, cache_key
+
+        # Preprocess image
+        if image is None:
+            with timed('image_decode'):
+                image = self.preprocess_image(image_bytes, model.imgsz)
+
+        if self.cache.enabled and self.cache.mode == 'perceptual':
+            with timed('cache'):
+                pil_image = image.image if isinstance(image, PreparedImage) else image
+                cache_key = self.cache.perceptual_key(crop_type, self.model_version(crop_type), pil_image)
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached, None, cache_key
+        return None, image, cache_key
+
+    def _finish(self, crop_type, class_names, probs, tier, cache_key):
+        if probs is None:
+            return {"error": "No probabilities found in prediction"}
+        with timed('postprocess'):
+            response = self._build_response(crop_type, class_names, probs)
+        response["model_tier"] = tier
+        if cache_key is not None:
+            self.cache.put(cache_key, response)
+        return response
+
+    def predict(self, crop_type, image_data, timer=None):
+        """Predict one image; `timer` (a StageTimer) receives per-stage durations."""
+        if timer is None:
+            return self._predict(crop_type, image_data)
+        timer.add('queue_wait', (time.monotonic() - timer.created) * 1000)
+        token = timer.activate()
+        try:
+            return self._predict(crop_type, image_data)
+        finally:
+            timer.deactivate(token)
+
+    def _predict(self, crop_type, image_data):
+        if crop_type == 'auto':
+            return self.predict_auto(image_data)
+        with timed('model_load'):
+            model = self.registry.get(crop_type)
+        if model is None:
             return {"error": f"YOLO model for crop '{crop_type}' not available"}
 
-        model = self.models[crop_type]
-        class_names = self.class_names[crop_type]
+        class_names = model.names
 
+        image_bytes = None
         try:
-            # Preprocess image
-            image = self.preprocess_image(image_data)
-
-            # Make prediction using YOLO
-            results = model.predict(image, verbose=False)
-
-            # Extract top prediction
-            if results and len(results) > 0:
-                result = results[0]
-                if result.probs is not None:
-                    # Get top class and confidence
-                    top_class_idx = result.probs.top1
-                    top_confidence = result.probs.top1conf.item()
-                    predicted_class = class_names[top_class_idx]
-
-                    # Get all probabilities
-                    probs = result.probs.data.tolist()
-                    prob_dict = {class_names[i]: probs[i] for i in range(len(class_names))}
-
-                    print(f"Prediction debug for crop '{crop_type}': {prob_dict}")
-
-                    # Attach recommendation and prevention if available
-                    rec = self._get_recommendation_for(predicted_class, crop_type)
-                    analysis = self._get_analysis_for(predicted_class, crop_type)
-
-                    response = {
-                        "predicted_class": predicted_class,
-                        "confidence": top_confidence,
-                        "probabilities": prob_dict,
-                    }
-
-                    # merge recommendation/prevention from CSV-first, then analysis JSON if missing
-                    if rec:
-                        response.update(rec)
-
-                    # analysis may contain severity and symptoms and optional recommendation/prevention
-                    if analysis:
-                        # do not overwrite recommendation/prevention if already present
-                        for k, v in analysis.items():
-                            if k in ('recommendation', 'prevention') and response.get(k):
-                                continue
-                            response[k] = v
-
-                    return response
+            image_bytes = self._image_bytes(image_data)
+            response, image, cache_key = self._lookup_or_decode(crop_type, model, image_bytes)
+            if response is None:
+                # Make prediction using YOLO (batched with concurrent requests when enabled)
+                with timed('inference'):
+                    probs, tier = self._classify(crop_type, model, image)
+                response = self._finish(crop_type, class_names, probs, tier, cache_key)
+
+        except Exception as e:
+            response = {"error": f"Prediction failed: {str(e)}"}
+
+        # Sampled debug capture happens on a background thread, off the request path
+        if image_bytes is not None:
+            self.capture.maybe_capture(image_bytes, crop_type, response)
+        return response
+
+    def _crop_identification(self, id_model, probs):
+        """Map crop-identifier probabilities to {crop_type, confidence, candidates}."""
+        ranked = sorted(range(len(probs)), key=lambda i: probs[i], reverse=True)
+        candidates = [
+            {"crop_type": str(id_model.names[i]).strip().lower().replace(' ', '_'), "confidence": float(probs[i])}
+            for i in ranked[:3]
+        ]
+        top = candidates[0]
+        crop_type = top["crop_type"]
+        if top["confidence"] < config.DISEASE_CROP_ID_MIN_CONFIDENCE or crop_type not in CROP_MODEL_DIRS:
+            crop_type = None
+        with self._crop_id_lock:
+            self._crop_id_counts['identified' if crop_type else 'uncertain'] += 1
+        return {"crop_type": crop_type, "confidence": top["confidence"], "candidates": candidates}
+
+    def _predict_identified(self, identification, image_bytes, prepared):
+        """Disease prediction for an image whose crop was identified, reusing its decode."""
+        crop_type = identification["crop_type"]
+        if crop_type is None:
+            return {
+                "error": "Could not identify the crop in this image, please choose the crop",
+                "crop_identification": identification,
+            }
+        model = self.registry.get(crop_type)
+        if model is None:
+            return {"error": f"YOLO model for crop '{crop_type}' not available", "crop_identification": identification}
+
+        response, _, cache_key = self._lookup_or_decode(crop_type, model, image_bytes, image=prepared)
+        if response is None:
+            with timed('inference'):
+                probs, tier = self._classify(crop_type, model, prepared)
+            response = self._finish(crop_type, model.names, probs, tier, cache_key)
+        response["crop_type"] = crop_type
+        response["crop_identification"] = identification
+        return response
+
+    def predict_auto(self, image_data):
+        """crop_type=auto: identify the crop, then run that crop's disease model.
+
+        The upload is decoded and preprocessed once; the disease model reuses
+        the identifier's input array when both share an input size.
+        """
+        id_model = self.crop_id_registry.get(CROP_ID_KEY)
+        if id_model is None:
+            return {"error": "Automatic crop identification is not available, please choose the crop"}
+
+        image_bytes = None
+        crop_type = 'auto'
+        try:
+            image_bytes = self._image_bytes(image_data)
+            with timed('image_decode'):
+                prepared = PreparedImage(self.preprocess_image(image_bytes, id_model.imgsz), id_model.imgsz)
+            with timed('crop_id'):
+                id_probs = self._infer(CROP_ID_KEY, prepared, tier=CROP_ID_KEY)
+            identification = self._crop_identification(id_model, id_probs)
+            crop_type = identification["crop_type"] or crop_type
+            response = self._predict_identified(identification, image_bytes, prepared)
+        except Exception as e:
+            response = {"error": f"Prediction failed: {str(e)}"}
+
+        if image_bytes is not None:
+            self.capture.maybe_capture(image_bytes, crop_type, response)
+        return response
+
+    def predict_many_auto(self, images_data):
+        """Batched `predict_auto`: identifier passes first, then batched disease passes per identified crop."""
+        id_model = self.crop_id_registry.get(CROP_ID_KEY)
+        if id_model is None:
+            return [{"error": "Automatic crop identification is not available, please choose the crop"} for _ in images_data]
+
+        responses = [None] * len(images_data)
+        decoded = []  # (index, image_bytes, prepared)
+        for i, image_data in enumerate(images_data):
+            try:
+                image_bytes = self._image_bytes(image_data)
+                decoded.append((i, image_bytes, PreparedImage(self.preprocess_image(image_bytes, id_model.imgsz), id_model.imgsz)))
+            except Exception as e:
+                responses[i] = {"error": f"Prediction failed: {str(e)}"}
+
+        identifications = {}
+        groups = {}  # crop_type -> [(index, image_bytes, prepared)]
+        chunk_size = max(1, config.DISEASE_BATCH_MAX_SIZE)
+        for start in range(0, len(decoded), chunk_size):
+            chunk = decoded[start:start + chunk_size]
+            try:
+                id_probs = self._run_model_batch(CROP_ID_KEY, [prepared for _, _, prepared in chunk], tier=CROP_ID_KEY)
+            except Exception as e:
+                for i, _, _ in chunk:
+                    responses[i] = {"error": f"Prediction failed: {str(e)}"}
+                continue
+            for entry, probs in zip(chunk, id_probs):
+                identification = self._crop_identification(id_model, probs)
+                identifications[entry[0]] = identification
+                if identification["crop_type"] is None:
+                    responses[entry[0]] = self._predict_identified(identification, None, None)
                 else:
-                    return {"error": "No probabilities found in prediction"}
+                    groups.setdefault(identification["crop_type"], []).append(entry)
+
+        for crop_type, entries in groups.items():
+            model = self.registry.get(crop_type)
+            if model is None:
+                for i, _, _ in entries:
+                    responses[i] = {"error": f"YOLO model for crop '{crop_type}' not available"}
             else:
-                return {"error": "No prediction results"}
+                self._predict_entries(crop_type, model, entries, responses)
+            for i, _, _ in entries:
+                responses[i]["crop_type"] = crop_type
+                responses[i]["crop_identification"] = identifications[i]
+        return responses
+
+    def crop_id_stats(self):
+        with self._crop_id_lock:
+            return dict(
+                self._crop_id_counts,
+                min_confidence=config.DISEASE_CROP_ID_MIN_CONFIDENCE,
+                model=self.crop_id_registry.stats(),
+            )
+
+    def predict_many(self, crop_type, images_data):
+        """Predict several images of one crop with batched forward passes.
+
+        Returns one response per input, in order, with the same shape as `predict`.
+        """
+        if crop_type == 'auto':
+            return self.predict_many_auto(images_data)
+        model = self.registry.get(crop_type)
+        if model is None:
+            return [{"error": f"YOLO model for crop '{crop_type}' not available"} for _ in images_data]
+
+        responses = [None] * len(images_data)
+        entries = []  # (index, image_bytes, image)
+        for i, image_data in enumerate(images_data):
+            try:
+                entries.append((i, self._image_bytes(image_data), None))
+            except Exception as e:
+                responses[i] = {"error": f"Prediction failed: {str(e)}"}
+        self._predict_entries(crop_type, model, entries, responses)
+        return responses
+
+    def _predict_entries(self, crop_type, model, entries, responses):
+        """Fill `responses[index]` for each (index, image_bytes, image) entry using batched passes.
+
+        `image` is None for undecoded uploads or an already decoded PreparedImage.
+        """
+        class_names = model.names
+        pending = []  # (index, image, cache_key)
+        for i, image_bytes, image in entries:
+            try:
+                response, image, cache_key = self._lookup_or_decode(crop_type, model, image_bytes, image=image)
+                if response is not None:
+                    responses[i] = response
+                else:
+                    pending.append((i, image, cache_key))
+            except Exception as e:
+                responses[i] = {"error": f"Prediction failed: {str(e)}"}
+
+        chunk_size = max(1, config.DISEASE_BATCH_MAX_SIZE)
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            try:
+                classified = self._classify_batch(crop_type, model, [image for _, image, _ in chunk])
+                for (i, _, cache_key), (probs, tier) in zip(chunk, classified):
+                    responses[i] = self._finish(crop_type, class_names, probs, tier, cache_key)
+            except Exception as e:
+                for i, _, _ in chunk:
+                    responses[i] = {"error": f"Prediction failed: {str(e)}"}
+
+        for i, image_bytes, _ in entries:
+            self.capture.maybe_capture(image_bytes, crop_type, responses[i])
+
+    def _build_response(self, crop_type, class_names, probs):
+        # Get top class and confidence
+        top_class_idx = max(range(len(probs)), key=probs.__getitem__)
+        top_confidence = probs[top_class_idx]
+        predicted_class = class_names[top_class_idx]
+
+        # Get all probabilities
+        prob_dict = {class_names[i]: probs[i] for i in range(len(class_names))}
+
+        # formatting the full dict is only paid when debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Prediction for crop '%s': %s", crop_type, prob_dict)
+
+        # Attach recommendation and prevention if available
+        with timed('recommendation'):
+            rec = self._get_recommendation_for(predicted_class, crop_type)
+            analysis = self._get_analysis_for(predicted_class, crop_type)
+
+        response = {
+            "predicted_class": predicted_class,
+            "confidence": top_confidence,
+            "probabilities": prob_dict,
+        }
 
-        except Exception as e:
-            return {"error": f"Prediction failed: {str(e)}"}
+        # merge recommendation/prevention from CSV-first, then analysis JSON if missing
+        if rec:
+            response.update(rec)
+
+        # analysis may contain severity and symptoms and optional recommendation/prevention
+        if analysis:
+            # do not overwrite recommendation/prevention if already present
+            for k, v in analysis.items():
+                if k in ('recommendation', 'prevention') and response.get(k):
+                    continue
+                response[k] = v
+
+        return response
 
     def _get_recommendation_for(self, disease_name: str, crop_type: str):
         if not disease_name:
             return None
-        def normalize(s: str) -> str:
-            s = s or ''
-            s = s.strip().lower()
-            s = re.sub(r'[^a-z0-9]+', '_', s)
-            s = re.sub(r'_+', '_', s).strip('_')
-            return s
-
-        raw = disease_name
-        norm = normalize(raw)
-        crop_norm = normalize(crop_type)
-
-        # Include crop-prefixed keys
-        crop_prefixed_keys = [
-            crop_type + '_' + raw,
-            crop_type + '_' + raw.lower(),
-            crop_type + '_' + raw.replace(' ', '_'),
-            crop_type + '_' + raw.replace(' ', '_').lower(),
-            crop_norm + '_' + norm,
-        ]
-
-        # Exact matches first, including crop-prefixed
-        all_keys = list((raw, raw.lower(), raw.replace(' ', '_'), raw.replace(' ', '_').lower(), norm)) + crop_prefixed_keys
-        for key in all_keys:
-            if key in self.recommendations:
-                return self.recommendations[key]
-
-        # Fallback: substring or normalized substring match
-        for k, v in self.recommendations.items():
-            if not k:
-                continue
-            if norm and norm in normalize(k):
-                return v
-            if normalize(k) and normalize(k) in norm:
-                return v
-
-        # No recommendation found
-        print(f"No recommendation mapping found for disease '{disease_name}' (normalized '{norm}') with crop '{crop_type}'")
-        return None
+        rec = self._recommendation_index.lookup(disease_name, crop_type)
+        if rec is None and (disease_name, crop_type) not in self._missing_recommendations:
+            # lookups are memoized, so only report each unmapped class once
+            self._missing_recommendations.add((disease_name, crop_type))
+            print(f"No recommendation mapping found for disease '{disease_name}' (normalized '{normalize(disease_name)}') with crop '{crop_type}'")
+        return rec
 
     def _get_analysis_for(self, disease_name: str, crop_type: str):
         if not disease_name:
             return None
-
-        def normalize(s: str) -> str:
-            s = s or ''
-            s = s.strip().lower()
-            s = re.sub(r'[^a-z0-9]+', '_', s)
-            s = re.sub(r'_+', '_', s).strip('_')
-            return s
-
-        raw = disease_name
-        norm = normalize(raw)
-        crop_norm = normalize(crop_type)
-
-        # try exact and normalized lookups
-        candidates = [raw, raw.lower(), raw.replace(' ', '_'), raw.replace(' ', '_').lower(), norm,
-                      f"{crop_type}_{raw}", f"{crop_norm}_{norm}"]
-
-        for key in candidates:
-            k = normalize(key)
-            if k in self.analysis:
-                return self.analysis[k]
-
-        # fallback: substring match
-        for k, v in self.analysis.items():
-            if not k:
-                continue
-            if norm and norm in k:
-                return v
-            if k in norm:
-                return v
-
-        return None
+        return self._analysis_index.lookup(disease_name, crop_type)
 
 # Singleton instance
 crop_disease_service = CropDiseaseService()
\ No newline at end of file
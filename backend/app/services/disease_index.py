@@ -0,0 +1,73 @@
+import re
+import threading
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(s: str) -> str:
+    """Lowercase and collapse every run of non-alphanumerics into one underscore."""
+    s = (s or '').strip().lower()
+    return _NON_ALNUM.sub('_', s).strip('_')
+
+
+class DiseaseIndex:
+    """Lookup index over disease entries (recommendations or analysis metadata).
+
+    Built once at load time from a `{key: entry}` dict. Exact and crop-prefixed
+    keys resolve with dict lookups; the fuzzy fallback (one normalized key
+    contained in the other) scans the precomputed normalized keys in entry
+    order and returns the first match, exactly like the original linear scan.
+    Every (disease, crop) result, including misses, is memoized, so each
+    model class name is resolved at most once.
+    """
+
+    def __init__(self, entries: dict):
+        self.entries = dict(entries)
+
+        self._normalized = {}
+        for key, entry in self.entries.items():
+            nkey = normalize(key)
+            if nkey and nkey not in self._normalized:
+                self._normalized[nkey] = entry
+        self._keys = list(self._normalized)  # entry order, first spelling wins
+
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._normalized)
+
+    def lookup(self, disease_name: str, crop_type: str):
+        if not disease_name:
+            return None
+        memo_key = (disease_name, crop_type)
+        with self._lock:
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+        entry = self._resolve(disease_name, crop_type or '')
+        with self._lock:
+            self._memo[memo_key] = entry
+        return entry
+
+    def _resolve(self, raw: str, crop_type: str):
+        norm = normalize(raw)
+        crop_norm = normalize(crop_type)
+
+        # Exact matches first: raw spellings, then crop-prefixed spellings
+        variants = (raw, raw.lower(), raw.replace(' ', '_'), raw.replace(' ', '_').lower(), norm)
+        for key in variants:
+            if key in self.entries:
+                return self.entries[key]
+        prefixed = [crop_type + '_' + key for key in variants[:4]] + [crop_norm + '_' + norm]
+        for key in prefixed:
+            if key in self.entries:
+                return self.entries[key]
+
+        if not norm:
+            return None
+
+        # Fallback: first key in entry order where one normalized form contains the other
+        for nkey in self._keys:
+            if norm in nkey or nkey in norm:
+                return self._normalized[nkey]
+        return None
@@ -0,0 +1,246 @@
+import logging
+import queue
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from app import config
+from app.database import SessionLocal
+from app.services.outbreak_stats import update_outbreak_stats
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """Write-behind buffer for history rows (CropPrediction, AssistantQuery, ...).
+
+    Request handlers hand over unsaved ORM rows and return immediately; a
+    background thread inserts them in multi-row transactions of up to
+    `batch_size` rows, at least every `flush_interval_ms`. The buffer is
+    bounded: when it is full a producer waits up to `enqueue_timeout_ms` for
+    space and then writes its rows itself, so memory stays bounded and load
+    is pushed back onto the requests that cause it. `close()` flushes
+    whatever is still buffered.
+
+    `after_commit(rows)` runs once rows are committed, e.g. to maintain
+    derived aggregates in a transaction of their own; its failures are logged
+    and never affect the history rows. Sessions are opened with
+    expire_on_commit=False so the hook can still read the committed rows.
+    """
+
+    def __init__(self, session_factory, capacity: int = 2000, batch_size: int = 100,
+                 flush_interval_ms: float = 200, enqueue_timeout_ms: float = 500, enabled: bool = True,
+                 after_commit=None):
+        self.session_factory = session_factory
+        self.after_commit = after_commit
+        self.capacity = max(1, int(capacity))
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.001, flush_interval_ms / 1000.0)
+        self.enqueue_timeout = max(0.0, enqueue_timeout_ms / 1000.0)
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=self.capacity)
+        self._thread = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+        self._queued = {}  # table -> rows accepted into the buffer
+        self._flushed = {}  # table -> rows committed
+        self._failed = {}  # table -> rows that could not be inserted
+        self._direct = 0  # rows written by the producer (buffer full or disabled)
+        self._backpressure_waits = 0
+        self._batches = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                    self._thread.start()
+
+    def _count(self, counter: dict, rows):
+        with self._lock:
+            for row in rows:
+                table = getattr(row, '__tablename__', type(row).__name__)
+                counter[table] = counter.get(table, 0) + 1
+
+    def _offer(self, rows):
+        """Enqueue without blocking; returns the rows that did not fit."""
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                return rows[i:]
+            self._count(self._queued, [row])
+        return []
+
+    def submit(self, rows):
+        """Queue rows for insertion, blocking briefly when the buffer is full."""
+        rows = [r for r in (rows if isinstance(rows, (list, tuple)) else [rows]) if r is not None]
+        if not rows:
+            return
+        if not self.enabled or self._closed:
+            self._write_direct(rows)
+            return
+        self._ensure_started()
+        rest = self._offer(rows)
+        if not rest:
+            return
+        with self._lock:
+            self._backpressure_waits += 1
+        deadline = time.monotonic() + self.enqueue_timeout
+        for i, row in enumerate(rest):
+            try:
+                self._queue.put(row, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                # still full: write the remainder on this thread
+                self._write_direct(rest[i:])
+                return
+            self._count(self._queued, [row])
+
+    async def submit_async(self, rows):
+        """`submit` for async handlers; only leaves the event loop when it has to wait or write."""
+        rows = [r for r in (rows if isinstance(rows, (list, tuple)) else [rows]) if r is not None]
+        if not rows:
+            return
+        if self.enabled and not self._closed:
+            self._ensure_started()
+            rows = self._offer(rows)
+            if not rows:
+                return
+        await run_in_threadpool(self.submit, rows)
+
+    def _write_direct(self, rows):
+        with self._lock:
+            self._direct += len(rows)
+        self._insert(rows)
+
+    def _run_after_commit(self, rows):
+        if self.after_commit is None:
+            return
+        try:
+            self.after_commit(rows)
+        except Exception as e:
+            logger.exception("History after-commit hook failed for %d rows: %s", len(rows), e)
+
+    def _insert(self, rows):
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            db.add_all(rows)
+            db.commit()
+            self._count(self._flushed, rows)
+            with self._lock:
+                self._batches += 1
+            committed = True
+        except Exception as e:
+            db.rollback()
+            committed = False
+            logger.warning("History batch insert of %d rows failed, retrying one by one: %s", len(rows), e)
+        finally:
+            db.close()
+        if committed:
+            self._run_after_commit(rows)
+            return
+
+        # isolate the bad rows so one failure does not drop the whole batch
+        saved = []
+        for row in rows:
+            db = self.session_factory(expire_on_commit=False)
+            try:
+                db.add(row)
+                db.commit()
+                self._count(self._flushed, [row])
+                saved.append(row)
+            except Exception as e:
+                db.rollback()
+                self._count(self._failed, [row])
+                logger.error("History insert failed for %s: %s", getattr(row, '__tablename__', row), e)
+            finally:
+                db.close()
+        if saved:
+            self._run_after_commit(saved)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            try:
+                self._insert(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                self._drain()
+                return
+
+    def _drain(self):
+        rest = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+            if item is not _STOP:
+                rest.append(item)
+        for start in range(0, len(rest), self.batch_size):
+            self._insert(rest[start:start + self.batch_size])
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self, timeout: float = 10.0):
+        """Stop accepting buffered writes and flush what is left."""
+        self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error("History writer did not finish flushing within %.1fs (%d rows left)", timeout, self._queue.qsize())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "buffered": self._queue.qsize(),
+                "capacity": self.capacity,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": round(self.flush_interval * 1000),
+                "queued": dict(self._queued),
+                "flushed": dict(self._flushed),
+                "failed": dict(self._failed),
+                "direct_writes": self._direct,
+                "backpressure_waits": self._backpressure_waits,
+                "batches": self._batches,
+            }
+
+
+history_writer = HistoryWriter(
+    SessionLocal,
+    capacity=config.HISTORY_BUFFER_SIZE,
+    batch_size=config.HISTORY_FLUSH_MAX_ROWS,
+    flush_interval_ms=config.HISTORY_FLUSH_INTERVAL_MS,
+    enqueue_timeout_ms=config.HISTORY_ENQUEUE_TIMEOUT_MS,
+    enabled=config.HISTORY_WRITE_BEHIND,
+    after_commit=update_outbreak_stats,
+)
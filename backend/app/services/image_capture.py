@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def _extension_for(image_bytes: bytes) -> str:
+    if image_bytes[:3] == b'\xff\xd8\xff':
+        return 'jpg'
+    if image_bytes[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'png'
+    if image_bytes[:4] == b'RIFF' and image_bytes[8:12] == b'WEBP':
+        return 'webp'
+    return 'bin'
+
+
+class ImageCapture:
+    """Sampled, off-request-path capture of uploaded images for debugging.
+
+    Disabled when `sample_rate` is 0. Sampled uploads are handed to a single
+    background writer thread through a bounded queue (dropped if it is full),
+    stored under content-hashed names with a JSON sidecar holding the
+    prediction, and the directory is kept to at most `max_files` captures by
+    deleting the oldest ones.
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, max_files: int = 500, queue_size: int = 64):
+        self.directory = directory
+        self.sample_rate = max(0.0, min(float(sample_rate), 1.0))
+        self.max_files = max(1, int(max_files))
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._ring = deque()  # capture base names, oldest first
+        self._worker = None
+        self._lock = threading.Lock()
+
+        self._captured = 0
+        self._dropped = 0
+        self._failed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def maybe_capture(self, image_bytes: bytes, crop_type: str, result: dict = None) -> bool:
+        """Queue the upload for capture if it is sampled. Never blocks the caller."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return False
+        self._ensure_worker()
+        summary = None
+        if result:
+            summary = {k: result.get(k) for k in ('predicted_class', 'confidence', 'error') if k in result}
+        try:
+            self._queue.put_nowait((bytes(image_bytes), crop_type, summary, time.time()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            # seed the ring with captures left by earlier runs so the bound holds across restarts
+            existing = [f[:-5] for f in os.listdir(self.directory) if f.endswith('.json')]
+            existing.sort(key=lambda base: os.path.getmtime(os.path.join(self.directory, base + '.json')))
+            self._ring.extend(existing)
+            self._worker = threading.Thread(target=self._run, name="image-capture", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            image_bytes, crop_type, summary, captured_at = self._queue.get()
+            try:
+                self._write(image_bytes, crop_type, summary, captured_at)
+                with self._lock:
+                    self._captured += 1
+            except Exception as e:
+                logger.warning("Image capture failed: %s", e)
+                with self._lock:
+                    self._failed += 1
+
+    def _write(self, image_bytes, crop_type, summary, captured_at):
+        digest = hashlib.sha256(image_bytes).hexdigest()[:20]
+        base = f"{crop_type}_{digest}"
+        image_path = os.path.join(self.directory, f"{base}.{_extension_for(image_bytes)}")
+
+        if not os.path.exists(image_path):
+            tmp_path = image_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, image_path)
+
+        meta = {'crop_type': crop_type, 'captured_at': captured_at, 'image': os.path.basename(image_path)}
+        if summary:
+            meta.update(summary)
+        meta_path = os.path.join(self.directory, base + '.json')
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+        if base in self._ring:
+            self._ring.remove(base)
+        self._ring.append(base)
+        while len(self._ring) > self.max_files:
+            self._remove(self._ring.popleft())
+
+    def _remove(self, base):
+        for name in os.listdir(self.directory):
+            if name.startswith(base + '.'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "max_files": self.max_files,
+                "captured": self._captured,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "pending": self._queue.qsize(),
+            }
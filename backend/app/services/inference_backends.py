@@ -0,0 +1,198 @@
+"""Inference backends for the per-crop disease classifiers.
+
+Every backend loads one exported classifier and exposes the same small surface:
+`names` (class index -> class name), `imgsz` (square input size) and
+`predict(images)`, which takes a list of RGB PIL images and returns one list of
+class probabilities per image.
+"""
+import ast
+import json
+
+import numpy as np
+from PIL import Image
+
+
+class PreparedImage:
+    """A decoded image together with its preprocessed CHW array.
+
+    Lets a second model with the same input size (e.g. the disease model after
+    the crop identifier) reuse the array instead of preprocessing again.
+    """
+
+    __slots__ = ('image', 'array')
+
+    def __init__(self, image, imgsz: int):
+        self.image = image
+        self.array = preprocess_batch([image], imgsz)[0]
+
+
+def preprocess_batch(images, imgsz: int) -> np.ndarray:
+    """Replicate Ultralytics' classify transforms without torchvision.
+
+    Resize the short side to `imgsz`, center-crop to `imgsz` x `imgsz`, scale to
+    [0, 1] and stack as an NCHW float32 array. PreparedImage items already at
+    `imgsz` are used as-is.
+    """
+    if len(images) == 1 and _prepared_for(images[0], imgsz):
+        return images[0].array[None]
+    batch = np.empty((len(images), 3, imgsz, imgsz), dtype=np.float32)
+    for i, image in enumerate(images):
+        if isinstance(image, PreparedImage):
+            if _prepared_for(image, imgsz):
+                batch[i] = image.array
+                continue
+            image = image.image
+        w, h = image.size
+        scale = imgsz / min(w, h)
+        new_w, new_h = max(imgsz, int(w * scale)), max(imgsz, int(h * scale))
+        resized = image.resize((new_w, new_h), Image.BILINEAR)
+        left = (new_w - imgsz) // 2
+        top = (new_h - imgsz) // 2
+        cropped = resized.crop((left, top, left + imgsz, top + imgsz))
+        arr = np.asarray(cropped, dtype=np.float32)
+        batch[i] = arr.transpose(2, 0, 1) / 255.0
+    return batch
+
+
+def _prepared_for(image, imgsz: int) -> bool:
+    return isinstance(image, PreparedImage) and image.array.shape[-1] == imgsz
+
+
+def _parse_imgsz(value, default=224):
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = ast.literal_eval(value)
+    if isinstance(value, (list, tuple)):
+        value = value[0]
+    return int(value)
+
+
+class UltralyticsModel:
+    """The original PyTorch path through the Ultralytics YOLO wrapper."""
+
+    weights_file = 'best.pt'
+
+    def __init__(self, path: str):
+        from ultralytics import YOLO  # heavy import, only paid when this backend is used
+        self.model = YOLO(path)
+        self.names = self.model.names
+        train_args = getattr(self.model.model, 'args', None) or {}
+        self.imgsz = _parse_imgsz(train_args.get('imgsz'))
+
+    def predict(self, images):
+        if any(isinstance(image, PreparedImage) for image in images):
+            import torch
+            # Ultralytics takes an NCHW tensor as-is, skipping its own transforms
+            images = torch.from_numpy(preprocess_batch(images, self.imgsz))
+        results = self.model.predict(images, verbose=False)
+        return [r.probs.data.tolist() if r.probs is not None else None for r in results]
+
+
+# int8 ONNX weights written next to best.onnx by quantize_disease_models.py
+INT8_WEIGHTS_FILE = 'best.int8.onnx'
+
+
+class OnnxModel:
+    """ONNX Runtime on CPU for `best.onnx` (export_disease_models.py) or `best.int8.onnx`."""
+
+    weights_file = 'best.onnx'
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        meta = self.session.get_modelmeta().custom_metadata_map
+        self.names = {int(k): v for k, v in ast.literal_eval(meta['names']).items()}
+        self.imgsz = _parse_imgsz(meta.get('imgsz'))
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # a static batch dimension means the model was exported without dynamic=True
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+
+    def predict(self, images):
+        batch = preprocess_batch(images, self.imgsz)
+        if self.dynamic_batch:
+            return self.session.run(None, {self.input_name: batch})[0].tolist()
+        return [self.session.run(None, {self.input_name: batch[i:i + 1]})[0][0].tolist()
+                for i in range(len(images))]
+
+
+class TorchScriptModel:
+    """TorchScript module (`best.torchscript`) without the Ultralytics wrapper."""
+
+    weights_file = 'best.torchscript'
+
+    def __init__(self, path: str):
+        import torch
+        self.torch = torch
+        extra_files = {'config.txt': ''}
+        self.model = torch.jit.load(path, _extra_files=extra_files, map_location='cpu')
+        self.model.eval()
+        meta = json.loads(extra_files['config.txt'] or '{}')
+        self.names = {int(k): v for k, v in meta.get('names', {}).items()}
+        self.imgsz = _parse_imgsz(meta.get('imgsz'))
+
+    def predict(self, images):
+        batch = self.torch.from_numpy(preprocess_batch(images, self.imgsz))
+        with self.torch.inference_mode():
+            out = self.model(batch)
+        if isinstance(out, (list, tuple)):
+            out = out[0]
+        return out.tolist()
+
+
+class SharedBackboneModel:
+    """Multi-crop model with one shared backbone (`multi_crop.pt`).
+
+    `view(crop)` returns an object with the usual backend surface (`names`,
+    `imgsz`, `predict(images)`) that runs the shared backbone plus that crop's
+    head, so it can be handed out by a registry like any per-crop model.
+    """
+
+    def __init__(self, path: str):
+        import torch
+        self.torch = torch
+        checkpoint = torch.load(path, map_location='cpu', weights_only=False)
+        self.model = checkpoint['model'].float().eval()
+        self.names = {crop: {int(k): v for k, v in names.items()} for crop, names in checkpoint['names'].items()}
+        self.imgsz = _parse_imgsz(checkpoint.get('imgsz'))
+        self._views = {crop: _CropHeadView(self, crop) for crop in self.names}
+
+    def crops(self):
+        return list(self.names)
+
+    def view(self, crop: str):
+        return self._views.get(crop)
+
+    def predict(self, crop: str, images):
+        batch = self.torch.from_numpy(preprocess_batch(images, self.imgsz))
+        with self.torch.inference_mode():
+            logits = self.model(batch, crop)
+        return logits.softmax(1).tolist()
+
+
+class _CropHeadView:
+    def __init__(self, shared: SharedBackboneModel, crop: str):
+        self.shared = shared
+        self.crop = crop
+        self.names = shared.names[crop]
+        self.imgsz = shared.imgsz
+
+    def predict(self, images):
+        return self.shared.predict(self.crop, images)
+
+
+BACKENDS = {
+    'ultralytics': UltralyticsModel,
+    'onnx': OnnxModel,
+    'torchscript': TorchScriptModel,
+}
+
+
+def get_backend(name: str):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
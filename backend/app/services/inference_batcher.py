@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ("item", "future", "enqueued_at")
+
+    def __init__(self, item):
+        self.item = item
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class MicroBatcher:
+    """Groups concurrent requests per key into a single batched call.
+
+    Each key (a crop type) gets its own queue and worker thread. The worker
+    takes the first waiting request, then keeps collecting until either
+    `max_batch_size` requests are gathered or `max_wait_ms` has passed since
+    the first one was queued, and runs `run_batch(key, items)` once for the
+    whole group. `run_batch` must return one result per item, in order.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int = 8, max_wait_ms: float = 10):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queues = {}
+        self._lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._failures = 0
+        self._batch_sizes = {}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, key, item) -> Future:
+        pending = _Pending(item)
+        self._queue_for(key).put(pending)
+        return pending.future
+
+    def _queue_for(self, key):
+        with self._lock:
+            q = self._queues.get(key)
+            if q is None:
+                q = queue.Queue()
+                self._queues[key] = q
+                worker = threading.Thread(target=self._worker, args=(key, q), name=f"batcher-{key}", daemon=True)
+                worker.start()
+            return q
+
+    def _worker(self, key, q):
+        while True:
+            first = q.get()
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(key, batch)
+
+    def _run(self, key, batch):
+        started = time.monotonic()
+        waits = [started - p.enqueued_at for p in batch]
+        try:
+            results = self.run_batch(key, [p.item for p in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} inputs")
+        except Exception as e:
+            logger.exception("Batched inference failed for %s: %s", key, e)
+            for p in batch:
+                p.future.set_exception(e)
+            self._record(batch, waits, failed=True)
+            return
+
+        for p, result in zip(batch, results):
+            p.future.set_result(result)
+        self._record(batch, waits, failed=False)
+
+    def _record(self, batch, waits, failed):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            if failed:
+                self._failures += 1
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._wait_total += sum(waits)
+            self._wait_max = max(self._wait_max, max(waits))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": round(self.max_wait * 1000, 1),
+                "batches": self._batches,
+                "items": self._items,
+                "failed_batches": self._failures,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": round(self._wait_total / self._items * 1000, 2) if self._items else 0.0,
+                "max_queue_wait_ms": round(self._wait_max * 1000, 2),
+            }
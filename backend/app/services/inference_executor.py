@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import config
+
+
+class ExecutorSaturated(Exception):
+    """Raised when the inference executor has no free worker or queue slot."""
+
+
+class BoundedExecutor:
+    """Thread pool with a hard cap on running + queued jobs.
+
+    Blocking model work (image decode, forward pass) runs here instead of on the
+    asyncio event loop. Once `max_workers + max_queue` jobs are in flight, new
+    submissions are rejected with ExecutorSaturated so callers can shed load
+    instead of letting latency pile up.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, name: str = "inference"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturated()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        """Submit `fn` and await its result from async code."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+        self._slots.release()
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+# Shared executor for crop disease inference
+inference_executor = BoundedExecutor(
+    max_workers=config.DISEASE_INFERENCE_WORKERS,
+    max_queue=config.DISEASE_INFERENCE_QUEUE_SIZE,
+)
@@ -0,0 +1,100 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INPUT_SIZE = 11  # 3 encoded categoricals + 8 continuous features
+NUM_CLASSES = 3  # Low / Medium / High
+
+
+def _as_array(value):
+    if hasattr(value, 'detach'):
+        value = value.detach().cpu().numpy()
+    return np.asarray(value, dtype=np.float64)
+
+
+def linear_layers(state_dict):
+    """[(weight, bias)] of IrrigationNN's Linear layers in forward order; weight is out x in."""
+    indices = sorted(
+        int(key.split('.')[1]) for key in state_dict
+        if key.startswith('model.') and key.endswith('.weight')
+    )
+    return [(_as_array(state_dict[f'model.{i}.weight']), _as_array(state_dict[f'model.{i}.bias'])) for i in indices]
+
+
+def scaler_params(scaler):
+    """(mean, scale) of a fitted StandardScaler as float64 arrays; identity for disabled parts."""
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    mean = np.zeros(INPUT_SIZE) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(INPUT_SIZE) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+def fold_scaler(layers, mean, scale):
+    """Fold the scaler's (x - mean) / scale into the first layer so it takes raw features.
+
+    W' = W / scale and b' = b - W' @ mean, so W' @ x + b' == W @ ((x - mean) / scale) + b.
+    """
+    (weight, bias), rest = layers[0], layers[1:]
+    weight = weight / np.asarray(scale, dtype=np.float64)[None, :]
+    bias = bias - weight @ np.asarray(mean, dtype=np.float64)
+    return [(weight, bias)] + list(rest)
+
+
+class NumpyIrrigationModel:
+    """IrrigationNN forward pass in plain NumPy.
+
+    Built from the layers of an irrigation bundle with the input scaler
+    folded into the first layer, so `logits` takes raw (unscaled) feature
+    rows; a batch is one matmul per layer and PyTorch is never imported.
+    """
+
+    engine = 'numpy'
+
+    def __init__(self, layers, path: str = None):
+        # x @ W orientation so the forward pass needs no transposes
+        self.layers = [
+            (np.ascontiguousarray(weight.T, dtype=np.float32), np.asarray(bias, dtype=np.float32))
+            for weight, bias in layers
+        ]
+        self.path = path
+
+    def logits(self, features):
+        x = np.asarray(features, dtype=np.float32)
+        last = len(self.layers) - 1
+        for i, (weight, bias) in enumerate(self.layers):
+            x = x @ weight
+            x += bias
+            if i < last:
+                np.maximum(x, 0, out=x)
+        return x
+
+
+class TorchIrrigationModel:
+    """The original PyTorch IrrigationNN; `logits` takes raw feature rows.
+
+    The scaler's mean and scale are applied with NumPy, so inference does
+    not call into sklearn.
+    """
+
+    engine = 'torch'
+
+    def __init__(self, model_path: str, mean, scale):
+        import torch
+        from app.services.irrigation_nn import IrrigationNN
+
+        state_dict = torch.load(model_path, map_location=torch.device('cpu'))
+        self.model = IrrigationNN(INPUT_SIZE, NUM_CLASSES)
+        self.model.load_state_dict(state_dict)
+        self.model.eval()
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.path = model_path
+        self._torch = torch
+
+    def logits(self, features):
+        scaled = (np.asarray(features, dtype=np.float32) - self.mean) / self.scale
+        with self._torch.no_grad():
+            return self.model(self._torch.tensor(scaled, dtype=self._torch.float32)).numpy()
@@ -0,0 +1,83 @@
+import hashlib
+import os
+
+import numpy as np
+
+from app.services.irrigation_backends import NumpyIrrigationModel, fold_scaler
+
+BUNDLE_FILE = 'irrigation_bundle.npz'
+BUNDLE_FORMAT_VERSION = 1
+# Encoders whose classes_ are stored in the bundle, as <field>_classes
+CATEGORY_FIELDS = ('crop', 'soil', 'season', 'target')
+
+
+def _content_hash(arrays) -> str:
+    digest = hashlib.sha256()
+    for key in sorted(arrays):
+        value = np.ascontiguousarray(arrays[key])
+        digest.update(f"{key}:{value.dtype.str}:{value.shape}".encode('utf-8'))
+        digest.update(value.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def write_bundle(path: str, layers, mean, scale, classes: dict, feature_order) -> str:
+    """Write a single-file irrigation model bundle and return its version hash.
+
+    `layers` are IrrigationNN's (weight, bias) pairs as trained (out x in,
+    scaler not folded), `mean`/`scale` the input scaler's parameters and
+    `classes` maps crop/soil/season/target to each encoder's classes_ in
+    code order. The bundle is a pickle-free .npz written to a temporary file
+    and renamed into place, so a reader never sees a partial bundle.
+    """
+    missing = [field for field in CATEGORY_FIELDS if classes.get(field) is None]
+    if missing:
+        raise ValueError(f"Bundle needs classes for {', '.join(missing)}")
+    arrays = {
+        'format_version': np.array(BUNDLE_FORMAT_VERSION),
+        'num_layers': np.array(len(layers)),
+        'scaler_mean': np.asarray(mean, dtype=np.float64),
+        'scaler_scale': np.asarray(scale, dtype=np.float64),
+        'feature_order': np.array([str(name) for name in feature_order]),
+    }
+    for i, (weight, bias) in enumerate(layers):
+        arrays[f'w{i}'] = np.asarray(weight, dtype=np.float32)
+        arrays[f'b{i}'] = np.asarray(bias, dtype=np.float32)
+    for field in CATEGORY_FIELDS:
+        arrays[f'{field}_classes'] = np.array([str(name) for name in classes[field]])
+    version = _content_hash(arrays)
+    arrays['version'] = np.array(version)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+    return version
+
+
+class IrrigationBundle:
+    """A loaded irrigation bundle: weights, scaler parameters, encoder classes,
+    feature order and the content hash used as the model version."""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        format_version = int(arrays['format_version'])
+        if format_version != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported irrigation bundle format {format_version} in {path}")
+        self.version = str(arrays.pop('version'))
+        if _content_hash(arrays) != self.version:
+            raise ValueError(f"Irrigation bundle {path} does not match its version hash")
+
+        self.path = path
+        self.feature_order = tuple(str(name) for name in arrays['feature_order'])
+        self.mean = arrays['scaler_mean']
+        self.scale = arrays['scaler_scale']
+        self.layers = [
+            (arrays[f'w{i}'].astype(np.float64), arrays[f'b{i}'].astype(np.float64))
+            for i in range(int(arrays['num_layers']))
+        ]
+        self.classes = {field: [str(name) for name in arrays[f'{field}_classes']] for field in CATEGORY_FIELDS}
+
+    def numpy_model(self):
+        """NumpyIrrigationModel with the scaler folded into the first layer."""
+        return NumpyIrrigationModel(fold_scaler(self.layers, self.mean, self.scale), self.path)
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+# Rough daily soil water balance for carrying soil moisture (%) forward
+# between forecast days; good enough to rank days, not an agronomic model.
+ROOT_ZONE_MM = 300.0  # water-holding depth the moisture percentage refers to
+EFFECTIVE_RAIN_FRACTION = 0.8  # share of rainfall that reaches the root zone
+ET_MM_PER_DEGREE = 0.18  # evapotranspiration per °C of mean temperature (30 °C ~ 5 mm/day)
+
+
+def _number(value, default):
+    try:
+        return default if value is None else float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _forecast_date(day):
+    try:
+        return datetime.strptime(str(day.get('iso_date')), '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def evapotranspiration_mm(temperature: float, humidity: float, wind_kmh: float) -> float:
+    """Approximate daily water loss: warmer, drier and windier days lose more."""
+    humidity_factor = 1.3 - 0.6 * min(max(humidity, 0.0), 100.0) / 100.0
+    wind_factor = 1.0 + max(wind_kmh, 0.0) / 100.0
+    return max(0.0, ET_MM_PER_DEGREE * temperature * humidity_factor * wind_factor)
+
+
+def carry_soil_moisture(moisture: float, rainfall_mm: float, temperature: float, humidity: float,
+                        wind_kmh: float) -> float:
+    """Soil moisture (%) at the start of the next day, assuming no irrigation."""
+    gain = EFFECTIVE_RAIN_FRACTION * max(rainfall_mm, 0.0)
+    loss = evapotranspiration_mm(temperature, humidity, wind_kmh)
+    return min(100.0, max(0.0, moisture + (gain - loss) / ROOT_ZONE_MM * 100.0))
+
+
+def build_forecast_rows(input_data: dict, forecast, days: int = 7):
+    """One model input row per day for the next `days` days.
+
+    Each row is `input_data` with that day's forecast temperature, rainfall,
+    wind and humidity. Day 0 starts from the measured soil moisture, and
+    each later day carries it forward from the previous day's rain and
+    evapotranspiration, assuming no irrigation, so the rows show when the
+    field would run dry. Days past the end of the forecast reuse the current
+    conditions from `input_data`.
+
+    A forecast day keeps its own date; padded days continue from the last
+    one (or from today when there is no forecast).
+
+    Returns (rows, days_info); days_info holds the per-day values that are
+    not part of the model result (date, soil moisture, weather source, ...).
+    """
+    forecast = forecast if isinstance(forecast, list) else []
+    moisture = _number(input_data.get('soil_moisture'), 60.0)
+    current = {
+        'temperature': _number(input_data.get('temperature'), 28.0),
+        'humidity': _number(input_data.get('humidity'), 70.0),
+        'rainfall': _number(input_data.get('rainfall'), 0.0),
+        'wind_speed': _number(input_data.get('wind_speed'), 10.0),
+    }
+    date = datetime.utcnow() - timedelta(days=1)
+
+    rows, days_info = [], []
+    for i in range(days):
+        day = forecast[i] if i < len(forecast) and isinstance(forecast[i], dict) else None
+        if day is not None:
+            high = _number(day.get('high_temp'), current['temperature'])
+            low = _number(day.get('low_temp'), current['temperature'])
+            weather = {
+                'temperature': _number(day.get('avg_temp'), (high + low) / 2.0),
+                'humidity': _number(day.get('avg_humidity'), current['humidity']),
+                'rainfall': _number(day.get('rainfall_mm'), 0.0),
+                'wind_speed': _number(day.get('max_wind_kmh'), current['wind_speed']),
+            }
+            precip_percent = _number(day.get('precipitation'), 0.0)
+            date = _forecast_date(day) or date + timedelta(days=1)
+        else:
+            weather = dict(current)
+            precip_percent = 0.0
+            date += timedelta(days=1)
+
+        row = dict(input_data)
+        row.update(weather)
+        row['soil_moisture'] = round(moisture, 1)
+        if i > 0:
+            row['previous_irrigation'] = 0.0
+        row['weather'] = {'precipitation': precip_percent}  # for the rule-based fallback
+        rows.append(row)
+        days_info.append({
+            'date': date.strftime('%Y-%m-%d'),
+            'soil_moisture': round(moisture, 1),
+            'temperature': round(weather['temperature'], 1),
+            'humidity': round(weather['humidity'], 1),
+            'rainfall_mm': round(weather['rainfall'], 1),
+            'wind_speed': round(weather['wind_speed'], 1),
+            'precipitation_percent': precip_percent,
+            'weather_source': 'forecast' if day is not None else 'current',
+        })
+        moisture = carry_soil_moisture(moisture, weather['rainfall'], weather['temperature'],
+                                       weather['humidity'], weather['wind_speed'])
+    return rows, days_info
@@ -1,160 +1,439 @@
-import torch
-import torch.nn as nn
 import pandas as pd
 import numpy as np
+import hashlib
 import os
+import threading
+import time
 import logging
 
+from app import config
+from app.services.irrigation_backends import TorchIrrigationModel, scaler_params
+from app.services.irrigation_bundle import BUNDLE_FILE, CATEGORY_FIELDS, IrrigationBundle
+from app.services.irrigation_forecast import _number, build_forecast_rows
+from app.services.model_registry import file_version
+
 logger = logging.getLogger(__name__)
 
+# Model input columns in training order; the first three are label-encoded
+FEATURE_ORDER = (
+    'soil_type', 'crop_type', 'season', 'soil_moisture', 'temperature', 'humidity',
+    'rainfall', 'sunlight_hours', 'wind_speed', 'area', 'previous_irrigation',
+)
+# (input key, default) for the continuous features, in FEATURE_ORDER
+CONTINUOUS_FEATURES = (
+    ('soil_moisture', 60.0),
+    ('temperature', 28.0),
+    ('humidity', 70.0),
+    ('rainfall', 5.0),
+    ('sunlight_hours', 8.0),
+    ('wind_speed', 10.0),
+    ('area', 1.0),
+    ('previous_irrigation', 0.0),
+)
+_AREA_COLUMN = [name for name, _ in CONTINUOUS_FEATURES].index('area')
+LITERS_PER_HECTARE = {'Low': 1000, 'Medium': 2500, 'High': 4000}
+# Code used for a category the encoder never saw (IRRIGATION_UNKNOWN_CATEGORY=zero)
+UNKNOWN_CODE = 0
+# Reported as model_version on rule-based estimates
+RULE_BASED_VERSION = 'rule-based'
+ENGINE_NAMES = {'numpy': 'NumPy', 'torch': 'PyTorch'}  # for result notes
+
+# Pre-bundle layout: PyTorch state_dict plus one joblib pickle per preprocessor
+LEGACY_MODEL_FILE = 'irrigation_model.pt'
+LEGACY_FILES = (LEGACY_MODEL_FILE, 'le_crop.pkl', 'le_soil.pkl', 'le_season.pkl', 'le_target.pkl', 'scaler_X.pkl')
+
+
+def category_codes(classes):
+    """{category: code} for an encoder's classes_; the code is the index, as LabelEncoder.transform() returns."""
+    return {str(name): code for code, name in enumerate(classes)}
+
+
+class IrrigationModelState:
+    """Everything a prediction needs from one loaded model; replaced as a whole on reload."""
+
+    def __init__(self, model, classes: dict, version: str, signature):
+        self.model = model
+        self.crop_codes = category_codes(classes['crop'])
+        self.soil_codes = category_codes(classes['soil'])
+        self.season_codes = category_codes(classes['season'])
+        self.target_labels = np.array([str(label) for label in classes['target']], dtype=object)
+        self.version = version
+        self.signature = signature
+
 
-class IrrigationNN(nn.Module):
-    def __init__(self, input_size, num_classes=3):
-        super(IrrigationNN, self).__init__()
-        self.model = nn.Sequential(
-            nn.Linear(input_size, 128),
-            nn.ReLU(),
-            nn.Linear(128, 64),
-            nn.ReLU(),
-            nn.Linear(64, 32),
-            nn.ReLU(),
-            nn.Linear(32, num_classes)
-        )
+def artifact_signature(model_dir: str, engine: str):
+    """File versions of the artifacts `load_model_state` would read; changes when any is replaced."""
+    bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+    if engine != 'torch' and os.path.exists(bundle_path):
+        return (file_version(bundle_path),)
+    return tuple(file_version(os.path.join(model_dir, name)) for name in LEGACY_FILES)
 
-    def forward(self, x):
-        return self.model(x)
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def load_model_state(model_dir: str, engine: str) -> IrrigationModelState:
+    """Load the irrigation model in `model_dir`; raises if it cannot be served.
+
+    Prefers the single-file bundle (NumPy engine, no torch or sklearn).
+    Without one, or with engine="torch", it reads the legacy layout of
+    irrigation_model.pt plus joblib-pickled encoders and scaler.
+    """
+    signature = artifact_signature(model_dir, engine)
+    bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+    if engine != 'torch' and os.path.exists(bundle_path):
+        bundle = IrrigationBundle(bundle_path)
+        if bundle.feature_order != FEATURE_ORDER:
+            raise ValueError(f"Bundle feature order {bundle.feature_order} does not match {FEATURE_ORDER}")
+        return IrrigationModelState(bundle.numpy_model(), bundle.classes, bundle.version, signature)
+    if engine not in ('numpy', 'torch'):
+        logger.warning("Unknown IRRIGATION_ENGINE %r; using the legacy torch model", engine)
+
+    import joblib
+
+    classes = {
+        field: list(joblib.load(os.path.join(model_dir, f'le_{field}.pkl')).classes_)
+        for field in CATEGORY_FIELDS
+    }
+    scaler = joblib.load(os.path.join(model_dir, 'scaler_X.pkl'))
+    model_path = os.path.join(model_dir, LEGACY_MODEL_FILE)
+    model = TorchIrrigationModel(model_path, *scaler_params(scaler))
+    return IrrigationModelState(model, classes, f"legacy-{_file_hash(model_path)}", signature)
 
 
 class IrrigationModelService:
-    def __init__(self, model_path: str):
-        """Load the PyTorch model and preprocessors."""
-        model_dir = os.path.dirname(model_path)
-        le_crop_file = os.path.join(model_dir, 'le_crop.pkl')
-        le_soil_file = os.path.join(model_dir, 'le_soil.pkl')
-        le_season_file = os.path.join(model_dir, 'le_season.pkl')
-        le_target_file = os.path.join(model_dir, 'le_target.pkl')
-        scaler_X_file = os.path.join(model_dir, 'scaler_X.pkl')
+    def __init__(self, model_dir: str):
+        """Load the irrigation model from `model_dir`; see `load_model_state`.
 
-        try:
-            # Load state_dict
-            state_dict = torch.load(model_path, map_location=torch.device('cpu'))
-            input_size = 11  # Matches training: 3 encoded categoricals + 8 continuous features
-            num_classes = 3  # Classification output: 3 irrigation need classes
-            self.model = IrrigationNN(input_size, num_classes)
-            self.model.load_state_dict(state_dict)
-            self.model.eval()
-            logger.info("Loaded PyTorch model successfully with input_size=%d, num_classes=%d", input_size, num_classes)
-        except Exception as e:
-            logger.exception("Failed to load PyTorch model: %s", e)
-            self.model = None
+        Until a model loads, predictions use the rule-based estimator. With
+        `start_watcher()` running, a replaced bundle (or legacy files) is
+        loaded in the background and swapped in without a restart.
+        """
+        self.model_dir = model_dir
+        self.unknown_policy = config.IRRIGATION_UNKNOWN_CATEGORY
+        self._state = None
+        self._seen_signature = None
+        self._reload_lock = threading.Lock()
+        self._reloads = 0
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self.reload()
+
+    @property
+    def model_version(self):
+        """Version of the model serving predictions; None while on the rule-based estimator."""
+        state = self._state
+        return state.version if state is not None else None
+
+    def reload(self):
+        """Load the model from disk and swap it in; returns True if a new model is now active.
+
+        The swap is a single reference assignment: predictions already
+        running keep the state they started with, and a model that fails to
+        load leaves the current one in place.
+        """
+        with self._reload_lock:
+            self._seen_signature = artifact_signature(self.model_dir, config.IRRIGATION_ENGINE)
+            try:
+                state = load_model_state(self.model_dir, config.IRRIGATION_ENGINE)
+            except Exception as e:
+                if self._state is None:
+                    logger.exception("Failed to load irrigation model from %s, using rule-based estimates: %s",
+                                     self.model_dir, e)
+                else:
+                    logger.exception("Failed to reload irrigation model from %s, keeping %s: %s",
+                                     self.model_dir, self._state.version, e)
+                return False
+            if self._state is not None:
+                self._reloads += 1
+            self._state = state
+        logger.info("Serving irrigation model %s (%s engine) from %s", state.version, state.model.engine, self.model_dir)
+        return True
+
+    def start_watcher(self, interval_seconds: float):
+        """Poll `model_dir` every `interval_seconds` and reload when the artifacts change."""
+        if interval_seconds <= 0 or self._watcher is not None:
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval_seconds,),
+                                         name="irrigation-model-watcher", daemon=True)
+        self._watcher.start()
 
+    def stop_watcher(self):
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join(timeout=5)
+        self._watcher = None
+
+    def _watch(self, interval_seconds: float):
+        while not self._stop_watching.wait(interval_seconds):
+            try:
+                if artifact_signature(self.model_dir, config.IRRIGATION_ENGINE) != self._seen_signature:
+                    logger.info("Irrigation model files in %s changed, reloading", self.model_dir)
+                    self.reload()
+            except Exception as e:
+                logger.exception("Irrigation model watcher error: %s", e)
+
+    def stats(self):
+        state = self._state
+        return {
+            "model_version": state.version if state is not None else None,
+            "engine": state.model.engine if state is not None else None,
+            "model_dir": self.model_dir,
+            "reloads": self._reloads,
+            "watching": self._watcher is not None,
+        }
+
+    def warmup(self, iterations: int = 2):
+        """Run a representative input through predict() so the first request skips lazy init.
+
+        Returns {"irrigation": {"warm", "seconds", "model_loaded", "engine", "model_version"[, "error"]}};
+        without a model the rule-based fallback is what gets warmed.
+        """
+        state = self._state
+        sample = {
+            'crop_type': next(iter(state.crop_codes), 'Rice') if state is not None else 'Rice',
+            'soil_type': next(iter(state.soil_codes), 'Loam') if state is not None else 'Loam',
+            'season': next(iter(state.season_codes), 'Kharif') if state is not None else 'Kharif',
+            'area': 1.0,
+        }
+        started = time.monotonic()
+        status = {
+            "model_loaded": state is not None,
+            "engine": state.model.engine if state is not None else None,
+            "model_version": state.version if state is not None else None,
+        }
         try:
-            import joblib
-            self.le_crop = joblib.load(le_crop_file)
-            self.le_soil = joblib.load(le_soil_file)
-            self.le_season = joblib.load(le_season_file) if os.path.exists(le_season_file) else None
-            self.le_target = joblib.load(le_target_file) if os.path.exists(le_target_file) else None
-            self.scaler_X = joblib.load(scaler_X_file)
-            logger.info("Loaded preprocessors successfully.")
+            for _ in range(max(1, iterations)):
+                self.predict(sample)
+            status["warm"] = True
         except Exception as e:
-            logger.exception("Failed to load preprocessors: %s", e)
-            self.le_crop = self.le_soil = self.le_season = self.le_target = self.scaler_X = None
+            logger.exception("Irrigation model warmup failed: %s", e)
+            status.update(warm=False, error=str(e))
+        status["seconds"] = round(time.monotonic() - started, 3)
+        return {"irrigation": status}
+
+    @staticmethod
+    def _encode(codes, values):
+        """(codes, unknown mask) for a column of category names; unseen names get UNKNOWN_CODE."""
+        encoded = np.fromiter((codes.get(str(v), -1) for v in values), dtype=np.int64, count=len(values))
+        unknown = encoded < 0
+        encoded[unknown] = UNKNOWN_CODE
+        return encoded, unknown
+
+    def _classify(self, state, crops, soils, seasons, continuous):
+        """Irrigation need labels for N rows in one (scaler +) forward pass.
+
+        `crops`, `soils` and `seasons` are length-N sequences of raw category
+        names; `continuous` is an N x 8 array in CONTINUOUS_FEATURES order.
+        With IRRIGATION_UNKNOWN_CATEGORY=fallback, rows with a category the
+        encoders never saw get None so the caller uses the rule-based estimate.
+        """
+        features = np.empty((len(crops), len(FEATURE_ORDER)), dtype=np.float32)
+        features[:, 0], soil_unknown = self._encode(state.soil_codes, soils)
+        features[:, 1], crop_unknown = self._encode(state.crop_codes, crops)
+        features[:, 2], season_unknown = self._encode(state.season_codes, seasons)
+        features[:, 3:] = continuous
+
+        predicted = np.argmax(state.model.logits(features), axis=1)
+        labels = state.target_labels[predicted]
+        if self.unknown_policy == 'fallback':
+            unknown = soil_unknown | crop_unknown | season_unknown
+            if unknown.any():
+                labels[unknown] = None
+        return labels
+
+    @staticmethod
+    def _model_result(irrigation_need, area, crop_type, soil_type, season, state):
+        liters_required = area * LITERS_PER_HECTARE.get(irrigation_need, 2500)
+        engine = ENGINE_NAMES.get(state.model.engine, state.model.engine)
+        return {
+            'irrigation_need': irrigation_need,
+            'liters_required': round(float(liters_required), 1),
+            'units': 'liters',
+            'area': area,
+            'crop': crop_type,
+            'soil': soil_type,
+            'season': season,
+            'model_version': state.version,
+            'note': f'Predicted by trained classification model ({engine} engine).'
+        }
 
     def predict(self, input_data: dict):
-        """Predict irrigation need using the loaded PyTorch model if available; 
+        """Predict irrigation need using the loaded model if available; 
         otherwise use a rule-based estimator.
 
         Returns a dictionary with 'irrigation_need' (classification: 'Low'/'Medium'/'High'), 
         'liters_required', 'units', etc.
         """
-        # Check if all required preprocessors are available for ML model
-        has_all_preprocessors = (
-            self.model is not None 
-            and self.le_crop is not None 
-            and self.le_soil is not None
-            and self.le_season is not None
-            and self.le_target is not None
-            and self.scaler_X is not None
-        )
-        
-        if has_all_preprocessors:
+        return self.predict_batch([input_data])[0]
+
+    def predict_batch(self, inputs):
+        """`predict` for many fields at once.
+
+        Rows are encoded, scaled and classified together in one vectorized
+        pass; the result list matches `inputs` in order and schema. A row
+        whose values cannot be read falls back to the rule-based estimator on
+        its own, and the whole batch falls back if the model pass fails.
+        """
+        inputs = list(inputs)
+        results = [None] * len(inputs)
+        state = self._state  # one model for the whole batch, even if a reload lands meanwhile
+
+        if state is not None and inputs:
+            rows, crops, soils, seasons, areas, continuous = [], [], [], [], [], []
+            for i, input_data in enumerate(inputs):
+                try:
+                    crop_type = input_data.get('crop_type') or 'Unknown'
+                    soil_type = input_data.get('soil_type') or 'Unknown'
+                    season = input_data.get('season') or 'Unknown'
+                    area = float(input_data.get('area') or 1.0)
+                    values = [float(input_data.get(name, default)) for name, default in CONTINUOUS_FEATURES]
+                except Exception as e:
+                    logger.warning("Irrigation input %d unreadable, using rule-based estimate: %s", i, e)
+                    continue
+                rows.append(i)
+                crops.append(crop_type)
+                soils.append(soil_type)
+                seasons.append(season)
+                areas.append(area)
+                continuous.append(values)
+
+            if rows:
+                try:
+                    needs = self._classify(state, crops, soils, seasons, np.asarray(continuous, dtype=np.float32))
+                except Exception as e:
+                    logger.exception("Irrigation model prediction failed, falling back to rule-based: %s", e)
+                else:
+                    for k, i in enumerate(rows):
+                        if needs[k] is not None:
+                            results[i] = self._model_result(needs[k], areas[k], crops[k], soils[k], seasons[k],
+                                                            state)
+
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = self._fallback_result(i, inputs[i])
+        return results
+
+    def predict_forecast(self, input_data: dict, forecast, days: int = 7):
+        """Per-day irrigation need for the next `days` days from one `predict_batch` call.
+
+        `forecast` is the weather service's forecast list; see
+        `build_forecast_rows` for how each day's row is derived. Each entry
+        keeps the keys of the former day-wise requirements (date,
+        water_liters, duration_minutes, precipitation_percent) and adds
+        irrigation_need, the projected soil moisture, that day's weather and
+        model_version.
+
+        `liters_required` is the need for the whole period, so a day's
+        water_liters is that day's row's liters spread over `days` and
+        reduced by the chance of rain (at most 80%), as the former planner
+        did.
+        """
+        rows, days_info = build_forecast_rows(input_data, forecast, days)
+        results = self.predict_batch(rows)
+        plan = []
+        for info, result in zip(days_info, results):
+            liters = float(result.get('liters_required') or 0.0) / days
+            liters *= 1 - min(info['precipitation_percent'] / 100.0, 0.8)
+            plan.append({
+                'date': info['date'],
+                'irrigation_need': result.get('irrigation_need'),
+                'water_liters': round(liters, 2),
+                'duration_minutes': max(5, int(liters * 0.02)),  # same rough rate as the generative planner
+                'precipitation_percent': info['precipitation_percent'],
+                'soil_moisture': info['soil_moisture'],
+                'temperature': info['temperature'],
+                'humidity': info['humidity'],
+                'rainfall_mm': info['rainfall_mm'],
+                'wind_speed': info['wind_speed'],
+                'weather_source': info['weather_source'],
+                'model_version': result.get('model_version'),
+            })
+        return plan
+
+    def predict_frame(self, data):
+        """`predict_batch` for tabular input; returns one result dict per row.
+
+        `data` is a DataFrame with the `predict` input keys as columns, or a
+        2-D object array whose columns follow FEATURE_ORDER, with crop, soil
+        and season given as names (as in `predict`), not encoded codes; a
+        numeric array raises ValueError. Columns are converted as whole
+        arrays rather than row by row. Missing cells (absent column, None or
+        NaN) take the same defaults as `predict`; rows with non-numeric
+        values fall back to the rule-based estimator.
+        """
+        if isinstance(data, np.ndarray):
+            if data.dtype != object:
+                raise ValueError("predict_frame needs an object array with category names, "
+                                 f"got dtype {data.dtype}")
+            frame = pd.DataFrame(np.atleast_2d(data), columns=list(FEATURE_ORDER))
+        else:
+            frame = data.reset_index(drop=True)
+        n = len(frame)
+        if n == 0:
+            return []
+
+        def category(name):
+            if name not in frame:
+                return np.full(n, 'Unknown', dtype=object)
+            column = frame[name]
+            blank = column.isna() | (column.astype(str).str.len() == 0)
+            return np.where(blank, 'Unknown', column.astype(str)).astype(object)
+
+        unreadable = np.zeros(n, dtype=bool)
+        continuous = np.empty((n, len(CONTINUOUS_FEATURES)), dtype=np.float32)
+        for k, (name, default) in enumerate(CONTINUOUS_FEATURES):
+            if name not in frame:
+                continuous[:, k] = default
+                continue
+            raw = frame[name]
+            values = pd.to_numeric(raw, errors='coerce')
+            unreadable |= (values.isna() & raw.notna()).to_numpy()
+            continuous[:, k] = values.fillna(default).to_numpy(dtype=np.float32)
+
+        results = [None] * n
+        rows = np.flatnonzero(~unreadable)
+        state = self._state
+        if state is not None and len(rows):
+            crops, soils, seasons = category('crop_type')[rows], category('soil_type')[rows], category('season')[rows]
+            field_area = continuous[rows, _AREA_COLUMN].astype(np.float64)
+            areas = np.where(field_area == 0, 1.0, field_area)  # predict uses `area or 1.0`
             try:
-                # Extract and encode categorical variables
-                crop_type = input_data.get('crop_type') or 'Unknown'
-                soil_type = input_data.get('soil_type') or 'Unknown'
-                season = input_data.get('season') or 'Unknown'
-                area = float(input_data.get('area') or 1.0)
-
-                # Encode categorical features
-                crop_encoded = self.le_crop.transform([crop_type])[0] if crop_type in self.le_crop.classes_ else 0
-                soil_encoded = self.le_soil.transform([soil_type])[0] if soil_type in self.le_soil.classes_ else 0
-                season_encoded = self.le_season.transform([season])[0] if season in self.le_season.classes_ else 0
-
-                # Extract continuous features from input_data
-                soil_moisture = float(input_data.get('soil_moisture', 60.0))
-                temperature = float(input_data.get('temperature', 28.0))
-                humidity = float(input_data.get('humidity', 70.0))
-                rainfall = float(input_data.get('rainfall', 5.0))
-                sunlight_hours = float(input_data.get('sunlight_hours', 8.0))
-                wind_speed = float(input_data.get('wind_speed', 10.0))
-                field_area = float(input_data.get('area', 1.0))
-                previous_irrigation = float(input_data.get('previous_irrigation', 0.0))
-
-                # Prepare input array with 11 features matching training data:
-                # [Soil_Type_enc, Crop_Type_enc, Season_enc, Soil_Moisture, Temperature_C, 
-                #  Humidity, Rainfall_mm, Sunlight_Hours, Wind_Speed_kmh, Field_Area_hectare, Previous_Irrigation_mm]
-                input_array = np.array([[
-                    soil_encoded, 
-                    crop_encoded, 
-                    season_encoded,
-                    soil_moisture,
-                    temperature,
-                    humidity,
-                    rainfall,
-                    sunlight_hours,
-                    wind_speed,
-                    field_area,
-                    previous_irrigation
-                ]], dtype=np.float32)
-
-                # Scale input
-                input_scaled = self.scaler_X.transform(input_array)
-
-                # Convert to tensor and predict
-                input_tensor = torch.tensor(input_scaled, dtype=torch.float32)
-                with torch.no_grad():
-                    logits = self.model(input_tensor)
-                    predicted_class = torch.argmax(logits, dim=1).item()
-
-                # Decode predicted class back to irrigation need label
-                irrigation_need = self.le_target.inverse_transform([predicted_class])[0]
-
-                # Estimate liters based on classification
-                liters_map = {
-                    'Low': area * 1000,
-                    'Medium': area * 2500,
-                    'High': area * 4000
-                }
-                liters_required = liters_map.get(irrigation_need, area * 2500)
-
-                result = {
-                    'irrigation_need': irrigation_need,
-                    'liters_required': round(float(liters_required), 1),
-                    'units': 'liters',
-                    'area': area,
-                    'crop': crop_type,
-                    'soil': soil_type,
-                    'season': season,
-                    'note': 'Predicted by trained PyTorch classification model.'
-                }
-                return result
+                needs = self._classify(state, crops, soils, seasons, continuous[rows])
             except Exception as e:
-                logger.exception("PyTorch model prediction failed, falling back to rule-based: %s", e)
+                logger.exception("Irrigation model prediction failed, falling back to rule-based: %s", e)
+            else:
+                for k, i in enumerate(rows):
+                    if needs[k] is not None:
+                        results[i] = self._model_result(needs[k], float(areas[k]), crops[k], soils[k], seasons[k],
+                                                        state)
+
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = self._fallback_result(i, frame.iloc[i].dropna().to_dict())
+        return results
+
+    def _fallback_result(self, index: int, input_data):
+        """Rule-based estimate for one row; a row that still cannot be read gets an error entry."""
+        try:
+            return self._rule_based(input_data)
+        except Exception as e:
+            logger.warning("Irrigation input %d could not be estimated: %s", index, e)
+            return {'error': f"Invalid input: {e}", 'model_version': RULE_BASED_VERSION}
 
-        # Fallback rule-based estimator
-        crop = (input_data.get('crop_type') or '').lower()
-        soil = (input_data.get('soil_type') or '').lower()
-        area = float(input_data.get('area') or 1.0)
+    def _rule_based(self, input_data: dict):
+        """Rough estimate used when the model, or a row's inputs, cannot be used."""
+        # lenient: an unreadable value takes its default instead of failing the row
+        crop = str(input_data.get('crop_type') or '').lower()
+        soil = str(input_data.get('soil_type') or '').lower()
+        area = _number(input_data.get('area'), 1.0) or 1.0
         weather = input_data.get('weather') or {}
 
         # base liters per acre per irrigation (very rough defaults)
@@ -206,6 +485,7 @@ class IrrigationModelService:
             'crop': crop,
             'soil': soil,
             'precip_percent': precip_percent,
+            'model_version': RULE_BASED_VERSION,
             'note': 'Estimated by fallback rule-based predictor.'
         }
 
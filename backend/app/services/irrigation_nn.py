@@ -0,0 +1,18 @@
+import torch.nn as nn
+
+
+class IrrigationNN(nn.Module):
+    def __init__(self, input_size, num_classes=3):
+        super(IrrigationNN, self).__init__()
+        self.model = nn.Sequential(
+            nn.Linear(input_size, 128),
+            nn.ReLU(),
+            nn.Linear(128, 64),
+            nn.ReLU(),
+            nn.Linear(64, 32),
+            nn.ReLU(),
+            nn.Linear(32, num_classes)
+        )
+
+    def forward(self, x):
+        return self.model(x)
@@ -0,0 +1,345 @@
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Base path for the per-crop YOLO classifier runs
+MODELS_BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'ml_models', 'runs', 'classify'))
+
+# Mapping of crop types to YOLO model directories
+CROP_MODEL_DIRS = {
+    'apple': 'Apple_YOLO_cls',
+    'banana': 'Banana_YOLO_cls',
+    'black_gram': 'Black_Gram_YOLO_cls',
+    'brinjal': 'Brinjal_YOLO_cls',
+    'cherry': 'Cherry_YOLO_cls',
+    'chilli': 'Chilli_YOLO_cls',
+    'corn': 'Corn_YOLO_cls',
+    'grape': 'Grape_YOLO_cls',
+    'pepper_bell': 'Pepper_bell_YOLO_cls',
+    'potato': 'Potato_YOLO_cls',
+    'rice': 'Rice_YOLO_cls',
+    'soybean': 'Soybean_YOLO_cls',
+    'strawberry': 'Strawberry_YOLO_cls',
+    'sugarcane': 'Sugarcane_YOLO_cls',
+    'tomato': 'Tomato_YOLO_cls',
+    'wheat': 'Wheat_YOLO_cls'
+}
+
+# Registry key of the crop-identification model used by crop_type=auto; its
+# run directory is config.DISEASE_CROP_ID_MODEL_DIR under MODELS_BASE_PATH
+CROP_ID_KEY = 'crop_id'
+
+
+def file_version(path: str):
+    """Cheap version tag for a weights file; changes whenever the file is replaced."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+
+class ModelRegistry:
+    """Lazily loads per-crop models and keeps a bounded, LRU-ordered set resident.
+
+    A crop's model is loaded on its first `get()`. When more than `max_models`
+    unpinned models (or more than `max_mb` megabytes of weights in total) are
+    resident, the least recently used unpinned model is evicted. Pinned crops
+    are never evicted, do not count against `max_models` and can be loaded up
+    front with `preload_pinned()`.
+
+    A resident model whose weights file has changed on disk is reloaded on its
+    next `get()`, and `on_change(crop)` is called so dependent caches can drop
+    results from the old weights. The file is checked at most once every
+    `check_interval` seconds per crop (0 = on every `get()`), outside the
+    registry lock.
+
+    `overrides` maps crop -> (weights_file, loader) for crops served from a
+    different file, e.g. a quantized best.int8.onnx. A crop falls back to the
+    default weights while its override file does not exist.
+    """
+
+    def __init__(self, base_path: str, model_dirs: dict, loader, weights_file: str = 'best.pt',
+                 max_models: int = 0, max_mb: float = 0, pinned=(), on_change=None, overrides=None,
+                 check_interval: float = 0):
+        self.base_path = base_path
+        self.model_dirs = dict(model_dirs)
+        self.loader = loader
+        self.weights_file = weights_file
+        self.overrides = {c: v for c, v in (overrides or {}).items() if c in self.model_dirs}
+        self.max_models = max(0, int(max_models or 0))  # 0 = unbounded
+        self.max_mb = max(0.0, float(max_mb or 0))  # 0 = unbounded
+        self.pinned = {c for c in pinned if c in self.model_dirs}
+        self.on_change = on_change
+        self.check_interval = max(0.0, float(check_interval or 0))
+
+        self._models = OrderedDict()  # crop -> model, least recently used first
+        self._sizes_mb = {}
+        self._versions = {}  # crop -> file_version of the resident weights
+        self._checked = {}  # crop -> monotonic time its weights file was last checked
+        self._lock = threading.Lock()
+        self._load_locks = {crop: threading.Lock() for crop in self.model_dirs}
+
+        self._loads = 0
+        self._load_failures = 0
+        self._evictions = 0
+        self._hits = 0
+        self._load_seconds = 0.0
+        self._reloads = 0
+
+    def _weights_for(self, crop: str):
+        """(path, loader) currently serving `crop`, or (None, None) for unknown crops."""
+        dir_name = self.model_dirs.get(crop)
+        if not dir_name:
+            return None, None
+        weights_dir = os.path.join(self.base_path, dir_name, 'weights')
+        override = self.overrides.get(crop)
+        if override is not None:
+            path = os.path.join(weights_dir, override[0])
+            if os.path.exists(path):
+                return path, override[1]
+        return os.path.join(weights_dir, self.weights_file), self.loader
+
+    def model_path(self, crop: str):
+        return self._weights_for(crop)[0]
+
+    def available(self):
+        """Crops whose weights exist on disk, whether or not they are resident."""
+        return [crop for crop in self.model_dirs if os.path.exists(self.model_path(crop))]
+
+    def model_version(self, crop: str):
+        """Version of the weights on disk for `crop` (None if missing)."""
+        path = self.model_path(crop)
+        return file_version(path) if path else None
+
+    def resident(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def get(self, crop: str):
+        """Return the model for `crop`, loading it on first use. None if unavailable."""
+        with self._lock:
+            model = self._models.get(crop)
+            if model is not None:
+                self._models.move_to_end(crop)
+                self._hits += 1
+                now = time.monotonic()
+                if now - self._checked.get(crop, 0.0) < self.check_interval:
+                    return model
+                # this caller checks the weights file; others keep serving until the next interval
+                self._checked[crop] = now
+                version = self._versions.get(crop)
+
+        if model is not None:
+            # stat the weights file outside the lock so warm crops never wait on the filesystem
+            if self.model_version(crop) == version:
+                return model
+            changed = False
+            with self._lock:
+                if self._models.get(crop) is model:
+                    # weights replaced on disk: drop the stale model and load the new one
+                    self._models.pop(crop, None)
+                    self._sizes_mb.pop(crop, None)
+                    self._versions.pop(crop, None)
+                    self._checked.pop(crop, None)
+                    self._reloads += 1
+                    changed = True
+            if changed:
+                logger.info("Model file for %s changed on disk, reloading", crop)
+                if self.on_change is not None:
+                    self.on_change(crop)
+
+        load_lock = self._load_locks.get(crop)
+        if load_lock is None:
+            return None
+
+        # Only one thread loads a given crop; others wait and then reuse it.
+        with load_lock:
+            with self._lock:
+                model = self._models.get(crop)
+                if model is not None:
+                    self._models.move_to_end(crop)
+                    self._hits += 1
+                    return model
+
+            model_path, loader = self._weights_for(crop)
+            if not os.path.exists(model_path):
+                logger.warning("Model file not found for %s: %s", crop, model_path)
+                return None
+
+            version = file_version(model_path)
+            started = time.monotonic()
+            try:
+                model = loader(model_path)
+            except Exception as e:
+                logger.exception("Error loading model for %s: %s", crop, e)
+                with self._lock:
+                    self._load_failures += 1
+                return None
+            elapsed = time.monotonic() - started
+
+            size_mb = os.path.getsize(model_path) / (1024 * 1024)
+            with self._lock:
+                self._models[crop] = model
+                self._sizes_mb[crop] = size_mb
+                self._versions[crop] = version
+                self._checked[crop] = time.monotonic()
+                self._loads += 1
+                self._load_seconds += elapsed
+                self._evict_locked(keep=crop)
+            logger.info("Loaded model for %s in %.2fs (%.1f MB)", crop, elapsed, size_mb)
+            return model
+
+    def preload_pinned(self):
+        for crop in sorted(self.pinned):
+            self.get(crop)
+
+    def evict(self, crop: str) -> bool:
+        with self._lock:
+            if crop not in self._models:
+                return False
+            self._remove_locked(crop)
+            return True
+
+    def _over_budget_locked(self):
+        if self.max_models and sum(1 for c in self._models if c not in self.pinned) > self.max_models:
+            return True
+        if self.max_mb and sum(self._sizes_mb.values()) > self.max_mb:
+            return True
+        return False
+
+    def _evict_locked(self, keep: str):
+        while self._over_budget_locked():
+            victim = next((c for c in self._models if c != keep and c not in self.pinned), None)
+            if victim is None:
+                # everything left is pinned or just loaded; allow the overshoot
+                break
+            self._remove_locked(victim)
+            logger.info("Evicted model for %s", victim)
+
+    def _remove_locked(self, crop: str):
+        self._models.pop(crop, None)
+        self._sizes_mb.pop(crop, None)
+        self._versions.pop(crop, None)
+        self._checked.pop(crop, None)
+        self._evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": list(self._models.keys()),
+                "resident_mb": round(sum(self._sizes_mb.values()), 1),
+                "pinned": sorted(self.pinned),
+                "weights_file": self.weights_file,
+                "overrides": {c: os.path.basename(self.model_path(c)) for c in sorted(self.overrides)},
+                "max_models": self.max_models,
+                "max_mb": self.max_mb,
+                "loads": self._loads,
+                "load_failures": self._load_failures,
+                "load_seconds_total": round(self._load_seconds, 3),
+                "evictions": self._evictions,
+                "reloads": self._reloads,
+                "hits": self._hits,
+            }
+
+
+class SharedBackboneRegistry:
+    """Registry for the shared-backbone serving mode.
+
+    A single multi-crop model (one backbone, one head per crop) stays resident
+    and `get(crop)` returns a per-crop view of it, so memory no longer grows
+    with the number of crops. It exposes the same methods as ModelRegistry,
+    including the `check_interval` rate limit on weights-file checks.
+    """
+
+    def __init__(self, model_path: str, loader, on_change=None, check_interval: float = 0):
+        self.path = model_path
+        self.loader = loader
+        self.on_change = on_change
+        self.check_interval = max(0.0, float(check_interval or 0))
+        self.weights_file = os.path.basename(model_path)
+        self._model = None
+        self._version = None
+        self._checked = 0.0  # monotonic time the weights file was last checked
+        self._lock = threading.Lock()
+
+        self._loads = 0
+        self._load_failures = 0
+        self._reloads = 0
+        self._hits = 0
+        self._load_seconds = 0.0
+
+    def model_path(self, crop: str):
+        return self.path
+
+    def model_version(self, crop: str):
+        return file_version(self.path)
+
+    def _ensure_loaded(self):
+        changed = False
+        with self._lock:
+            now = time.monotonic()
+            if self._model is not None and now - self._checked < self.check_interval:
+                return self._model
+            self._checked = now
+            version = file_version(self.path)
+            if self._model is not None and self._version == version:
+                return self._model
+            if version is None:
+                return None
+            if self._model is not None:
+                self._reloads += 1
+                changed = True
+            started = time.monotonic()
+            try:
+                self._model = self.loader(self.path)
+                self._version = version
+            except Exception as e:
+                logger.exception("Error loading shared multi-crop model: %s", e)
+                self._load_failures += 1
+                return None
+            self._loads += 1
+            self._load_seconds += time.monotonic() - started
+            model = self._model
+        logger.info("Loaded shared multi-crop model %s for crops %s", self.path, model.crops())
+        if changed and self.on_change is not None:
+            for crop in model.crops():
+                self.on_change(crop)
+        return model
+
+    def get(self, crop: str):
+        model = self._ensure_loaded()
+        if model is None:
+            return None
+        with self._lock:
+            self._hits += 1
+        return model.view(crop)
+
+    def available(self):
+        model = self._ensure_loaded()
+        return model.crops() if model is not None else []
+
+    def resident(self):
+        return ['shared'] if self._model is not None else []
+
+    def preload_pinned(self):
+        self._ensure_loaded()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": "shared",
+                "resident": ['shared'] if self._model is not None else [],
+                "resident_mb": round(os.path.getsize(self.path) / (1024 * 1024), 1) if self._model is not None else 0.0,
+                "crops": self._model.crops() if self._model is not None else [],
+                "weights_file": self.weights_file,
+                "loads": self._loads,
+                "load_failures": self._load_failures,
+                "load_seconds_total": round(self._load_seconds, 3),
+                "reloads": self._reloads,
+                "hits": self._hits,
+            }
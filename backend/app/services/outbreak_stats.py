@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app.database import SessionLocal
+from app.models.crop_prediction import CropPrediction
+from app.models.disease_outbreak_stat import DiseaseOutbreakStat
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# users.district rarely changes; cache it so saving a prediction does not
+# query users every time
+_DISTRICT_TTL_SECONDS = 3600
+_DISTRICT_CACHE_MAX = 50000
+_district_cache = {}  # user_id -> (district, expires_at)
+_district_lock = threading.Lock()
+
+
+def iso_week(dt: datetime) -> str:
+    """ISO-8601 week label, e.g. 2026-W07 (same as MySQL DATE_FORMAT '%x-W%v')."""
+    year, week, _ = dt.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def week_range(weeks: int, now: datetime = None):
+    """(first, last) ISO week labels covering the last `weeks` weeks including this one."""
+    now = now or datetime.utcnow()
+    return iso_week(now - timedelta(weeks=max(1, weeks) - 1)), iso_week(now)
+
+
+def _districts_for(db, user_ids):
+    now = time.monotonic()
+    found, missing = {}, []
+    with _district_lock:
+        for uid in user_ids:
+            cached = _district_cache.get(uid)
+            if cached is not None and cached[1] > now:
+                found[uid] = cached[0]
+            else:
+                missing.append(uid)
+    if missing:
+        rows = db.query(User.id, User.district).filter(User.id.in_(missing)).all()
+        fetched = {uid: (district or "").strip() for uid, district in rows}
+        with _district_lock:
+            if len(_district_cache) > _DISTRICT_CACHE_MAX:
+                _district_cache.clear()
+            for uid in missing:
+                district = fetched.get(uid, "")
+                _district_cache[uid] = (district, now + _DISTRICT_TTL_SECONDS)
+                found[uid] = district
+    return found
+
+
+def record_predictions(db, rows):
+    """Add `rows`' CropPredictions to the outbreak aggregates in `db`'s transaction.
+
+    All increments go out as one multi-row upsert; the caller commits.
+    """
+    preds = [r for r in rows if isinstance(r, CropPrediction) and r.predicted_class]
+    if not preds:
+        return
+    districts = _districts_for(db, {p.user_id for p in preds if p.user_id is not None})
+
+    increments = {}
+    now = datetime.utcnow()
+    for p in preds:
+        key = (
+            districts.get(p.user_id, ""),
+            (p.crop_type or "").lower(),
+            p.predicted_class,
+            iso_week(p.created_at or now),
+        )
+        count, confidence = increments.get(key, (0, 0.0))
+        increments[key] = (count + 1, confidence + float(p.confidence or 0.0))
+
+    table = DiseaseOutbreakStat.__table__
+    stmt = mysql_insert(table).values([
+        {
+            "district": district,
+            "crop_type": crop_type,
+            "predicted_class": predicted_class,
+            "iso_week": week,
+            "count": count,
+            "confidence_sum": confidence,
+            "updated_at": now,
+        }
+        for (district, crop_type, predicted_class, week), (count, confidence) in increments.items()
+    ])
+    db.execute(stmt.on_duplicate_key_update(
+        count=table.c["count"] + stmt.inserted["count"],
+        confidence_sum=table.c.confidence_sum + stmt.inserted.confidence_sum,
+        updated_at=stmt.inserted.updated_at,
+    ))
+
+
+def update_outbreak_stats(rows, session_factory=SessionLocal):
+    """Add already committed CropPrediction rows to the aggregates in a transaction of their own.
+
+    The aggregates are derived data: a failure (lock wait, schema problem)
+    is logged and never costs the saved history rows; backfill_outbreak_stats.py
+    rebuilds any counts that were missed.
+    """
+    preds = [r for r in rows if isinstance(r, CropPrediction) and r.predicted_class]
+    if not preds:
+        return
+    db = session_factory()
+    try:
+        record_predictions(db, preds)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("Outbreak stats update for %d predictions failed (backfill_outbreak_stats.py repairs it): %s",
+                       len(preds), e)
+    finally:
+        db.close()
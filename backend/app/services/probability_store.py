@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import struct
+import threading
+
+from sqlalchemy.exc import IntegrityError
+
+from app.database import SessionLocal
+from app.models.model_version import ModelVersion
+
+logger = logging.getLogger(__name__)
+
+
+def pack_probabilities(probs) -> bytes:
+    """Pack class probabilities (class-index order) as little-endian float16."""
+    return struct.pack(f"<{len(probs)}e", *probs)
+
+
+def unpack_probabilities(blob: bytes):
+    return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+
+
+def legacy_version(class_names) -> str:
+    """Version tag for class lists recovered from legacy JSON rows."""
+    digest = hashlib.sha1(json.dumps(list(class_names)).encode('utf-8')).hexdigest()
+    return f"legacy-{digest[:16]}"
+
+
+class ModelVersionStore:
+    """Maps (crop_type, model version, class names) to `model_versions` ids and back.
+
+    Both directions are cached in memory (`preload()` fills the cache at
+    startup); the database is only touched the first time a process sees a
+    new model version, so history writes and reads normally cost no extra
+    queries. A cache miss does blocking I/O, so call `resolve`/`decode` off
+    the event loop.
+    """
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._ids = {}  # (crop_type, version) -> id
+        self._names = {}  # id -> [class names]
+
+    def preload(self):
+        """Cache every known model version so requests normally never query model_versions."""
+        db = self.session_factory()
+        try:
+            rows = db.query(ModelVersion).all()
+        finally:
+            db.close()
+        with self._lock:
+            for row in rows:
+                self._ids[(row.crop_type, row.version)] = row.id
+                self._names[row.id] = json.loads(row.class_names)
+        return len(rows)
+
+    def resolve(self, crop_type: str, version: str, class_names) -> int:
+        key = (crop_type, version)
+        with self._lock:
+            version_id = self._ids.get(key)
+        if version_id is not None:
+            return version_id
+
+        names = list(class_names)
+        db = self.session_factory()
+        try:
+            row = db.query(ModelVersion).filter_by(crop_type=crop_type, version=version).first()
+            if row is None:
+                row = ModelVersion(crop_type=crop_type, version=version, class_names=json.dumps(names))
+                db.add(row)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # another worker registered the same version first
+                    db.rollback()
+                    row = db.query(ModelVersion).filter_by(crop_type=crop_type, version=version).one()
+            version_id = row.id
+            names = json.loads(row.class_names)
+        finally:
+            db.close()
+
+        with self._lock:
+            self._ids[key] = version_id
+            self._names[version_id] = names
+        return version_id
+
+    def class_names(self, version_id: int):
+        with self._lock:
+            names = self._names.get(version_id)
+        if names is not None:
+            return names
+
+        db = self.session_factory()
+        try:
+            row = db.query(ModelVersion).filter_by(id=version_id).first()
+        finally:
+            db.close()
+        if row is None:
+            logger.warning("model_versions row %s not found", version_id)
+            return None
+        names = json.loads(row.class_names)
+        with self._lock:
+            self._names[version_id] = names
+        return names
+
+    def decode(self, blob: bytes, version_id: int):
+        """{class name: probability} for a packed row, or None if it cannot be mapped."""
+        names = self.class_names(version_id)
+        if names is None:
+            return None
+        probs = unpack_probabilities(blob)
+        if len(probs) != len(names):
+            logger.warning("Packed probabilities (%d) do not match model_versions %s (%d classes)",
+                           len(probs), version_id, len(names))
+            return None
+        return {name: round(p, 4) for name, p in zip(names, probs)}
+
+
+model_version_store = ModelVersionStore(SessionLocal)
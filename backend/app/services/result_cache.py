@@ -0,0 +1,106 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def dhash(image, hash_size: int = 8) -> str:
+    """Difference hash of a PIL image; survives recompression and resizing."""
+    small = image.convert('L').resize((hash_size + 1, hash_size))
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of disease prediction responses.
+
+    Keys are (crop_type, model_version, image hash). In "exact" mode the hash
+    is a SHA-256 of the uploaded bytes and is checked before decoding; in
+    "perceptual" mode it is a dHash of the decoded image, so re-encoded or
+    resized copies of the same photo also hit. Because the model version is
+    part of the key, replacing a model file makes its old entries unreachable;
+    `invalidate_crop` drops them eagerly.
+    """
+
+    MODES = ('exact', 'perceptual')
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 900, mode: str = 'exact'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cache mode '{mode}', expected one of {self.MODES}")
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = max(0.0, float(ttl_seconds))
+        self.mode = mode
+        self._entries = OrderedDict()  # key -> (expires_at, response)
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def exact_key(self, crop_type: str, model_version: str, image_bytes: bytes):
+        return (crop_type, model_version, hashlib.sha256(image_bytes).hexdigest())
+
+    def perceptual_key(self, crop_type: str, model_version: str, image):
+        return (crop_type, model_version, 'dhash:' + dhash(image))
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires_at, response = item
+            if self.ttl and expires_at <= now:
+                del self._entries[key]
+                self._expired += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return dict(response)
+
+    def put(self, key, response: dict):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_crop(self, crop_type: str):
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == crop_type]
+            for k in stale:
+                del self._entries[k]
+            self._invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "mode": self.mode,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,32 @@
+import torch
+import torch.nn as nn
+
+
+class MultiCropClassifier(nn.Module):
+    """One shared feature backbone with a classification head per crop.
+
+    The backbone is the YOLO-cls feature extractor (every layer except the
+    final Classify head) and `heads` maps crop type -> Classify head, so the
+    16 crops share one set of backbone weights instead of 16 copies.
+    Built by train_shared_backbone.py from the existing per-crop best.pt files.
+    """
+
+    def __init__(self, backbone: nn.Module, heads: dict):
+        super().__init__()
+        self.backbone = backbone
+        self.heads = nn.ModuleDict(heads)
+
+    def forward(self, x, crop: str):
+        return head_logits(self.heads[crop], self.backbone(x))
+
+
+def head_logits(head: nn.Module, features):
+    """Logits from an Ultralytics Classify head in either train or eval mode."""
+    out = head(features)
+    if isinstance(out, (list, tuple)):
+        # eval mode returns (softmax, logits)
+        return out[1]
+    if not head.training:
+        # older Ultralytics versions return only the softmax in eval mode
+        return torch.log(out.clamp_min(1e-12))
+    return out
@@ -0,0 +1,116 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current_timer = contextvars.ContextVar('stage_timer', default=None)
+
+
+class StageTimer:
+    """Per-request stage durations measured with the monotonic clock.
+
+    The route creates one timer per request and the service activates it on
+    the thread that runs the prediction, so helpers deep in the call chain
+    can record stages with the module-level `timed(name)` without the timer
+    being passed through every call. Repeated stages accumulate.
+
+    Stages record exclusive time: a stage opened inside another (the cache
+    lookup inside a prediction, the recommendation inside postprocess) is
+    subtracted from its parent, so the stages never overlap and add up to
+    no more than the request's `total`.
+    """
+
+    def __init__(self):
+        self.created = time.monotonic()
+        self.stages = {}  # stage -> milliseconds, in first-seen order
+        self._open = []  # child milliseconds of each stage currently open, innermost last
+
+    def add(self, name: str, ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.monotonic()
+        self._open.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = (time.monotonic() - started) * 1000
+            children = self._open.pop()
+            if self._open:
+                self._open[-1] += elapsed
+            self.add(name, elapsed - children)
+
+    def activate(self):
+        return _current_timer.set(self)
+
+    def deactivate(self, token):
+        _current_timer.reset(token)
+
+    def server_timing(self) -> str:
+        """Value for the `Server-Timing` response header."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
+
+
+@contextmanager
+def timed(name: str):
+    """Record `name` on the active StageTimer; a no-op when none is active."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
+
+
+class LatencyHistograms:
+    """Cumulative per-crop, per-stage latency histograms with fixed buckets."""
+
+    def __init__(self, bounds_ms=BUCKET_BOUNDS_MS):
+        self.bounds = tuple(bounds_ms)
+        self._lock = threading.Lock()
+        self._series = {}  # (crop, stage) -> [bucket counts..., count, sum_ms]
+
+    def observe(self, crop: str, stages: dict):
+        with self._lock:
+            for stage, ms in stages.items():
+                series = self._series.get((crop, stage))
+                if series is None:
+                    series = self._series[(crop, stage)] = [0] * (len(self.bounds) + 1) + [0, 0.0]
+                series[bisect.bisect_left(self.bounds, ms)] += 1
+                series[-2] += 1
+                series[-1] += ms
+
+    def _quantile(self, buckets, count, q):
+        target = q * count
+        cumulative = 0
+        for i, n in enumerate(buckets):
+            cumulative += n
+            if cumulative >= target:
+                return self.bounds[i] if i < len(self.bounds) else None
+        return None
+
+    def snapshot(self):
+        """{crop: {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, buckets}}}; percentiles are bucket upper bounds."""
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        labels = [f"le_{b}" for b in self.bounds] + ["le_inf"]
+        out = {}
+        for (crop, stage), series in sorted(items):
+            buckets, count, total = series[:-2], series[-2], series[-1]
+            out.setdefault(crop, {})[stage] = {
+                "count": count,
+                "mean_ms": round(total / count, 2) if count else 0.0,
+                "p50_ms": self._quantile(buckets, count, 0.50),
+                "p95_ms": self._quantile(buckets, count, 0.95),
+                "p99_ms": self._quantile(buckets, count, 0.99),
+                "buckets": dict(zip(labels, buckets)),
+            }
+        return out
+
+
+disease_latency = LatencyHistograms()
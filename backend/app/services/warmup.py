@@ -0,0 +1,69 @@
+import logging
+import threading
+import time
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """Tracks the startup warmup of the inference models for /readyz.
+
+    `run(steps)` calls each step (a callable returning {model name: status
+    dict}) in order and merges the per-model statuses. Steps are expected to
+    catch their own per-model errors; a step that raises is recorded as one
+    failed entry under its own name.
+
+    `required` names the models readiness waits for; a model outside it
+    that stays cold is reported but does not keep the service unready.
+    Required names that no step reports (crop without weights, warmup
+    disabled) are ignored.
+    """
+
+    def __init__(self, required=()):
+        self.required = set(required)
+        self._lock = threading.Lock()
+        self._models = {}
+        self._started_at = None
+        self._finished_at = None
+
+    def run(self, steps):
+        with self._lock:
+            self._started_at = time.time()
+            self._finished_at = None
+        for name, step in steps:
+            started = time.monotonic()
+            try:
+                statuses = step()
+            except Exception as e:
+                logger.exception("Warmup step %s failed: %s", name, e)
+                statuses = {name: {"warm": False, "seconds": round(time.monotonic() - started, 3), "error": str(e)}}
+            with self._lock:
+                self._models.update(statuses)
+        with self._lock:
+            self._finished_at = time.time()
+            cold = [name for name, status in self._models.items() if not status.get("warm")]
+            total = self._finished_at - self._started_at
+        logger.info("Model warmup finished in %.2fs (%d models, cold: %s)", total, len(self._models), cold or "none")
+
+    @property
+    def done(self) -> bool:
+        with self._lock:
+            return self._finished_at is not None
+
+    def snapshot(self):
+        with self._lock:
+            finished = self._finished_at is not None
+            cold = sorted(name for name, status in self._models.items() if not status.get("warm"))
+            return {
+                "done": finished,
+                "ready": finished and not self.required.intersection(cold),
+                "all_warm": finished and not cold,
+                "cold": cold,
+                "seconds": round((self._finished_at or time.time()) - self._started_at, 3) if self._started_at else None,
+                "models": {name: dict(status) for name, status in self._models.items()},
+            }
+
+
+warmup_state = WarmupState(config.MODEL_WARMUP_REQUIRED)
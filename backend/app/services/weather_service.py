@@ -53,6 +53,12 @@ def get_weather(city: str):
                 "low_temp": round(day_data.get("mintemp_c", 0), 1),
                 "condition": day_data.get("condition", {}).get("text", "Unknown"),
                 "precipitation": round(day_data.get("daily_chance_of_rain", 0), 0),
+                # daily values used by the irrigation forecast
+                "avg_temp": round(day_data.get("avgtemp_c", 0), 1),
+                "rainfall_mm": round(day_data.get("totalprecip_mm", 0), 1),
+                "max_wind_kmh": round(day_data.get("maxwind_kph", 0), 1),
+                "avg_humidity": day_data.get("avghumidity", 0),
+                "iso_date": day.get("date"),  # YYYY-MM-DD
             })
 
         # Sunrise and sunset from forecast (first day)
@@ -140,6 +146,12 @@ def get_weather_by_coords(lat: float, lon: float):
                 "low_temp": round(day_data.get("mintemp_c", 0), 1),
                 "condition": day_data.get("condition", {}).get("text", "Unknown"),
                 "precipitation": round(day_data.get("daily_chance_of_rain", 0), 0),
+                # daily values used by the irrigation forecast
+                "avg_temp": round(day_data.get("avgtemp_c", 0), 1),
+                "rainfall_mm": round(day_data.get("totalprecip_mm", 0), 1),
+                "max_wind_kmh": round(day_data.get("maxwind_kph", 0), 1),
+                "avg_humidity": day_data.get("avghumidity", 0),
+                "iso_date": day.get("date"),  # YYYY-MM-DD
             })
 
         # Sunrise and sunset from forecast (first day)
@@ -0,0 +1,75 @@
+"""
+Rebuild disease_outbreak_stats from crop_predictions.
+
+Usage (from the backend folder):
+    python backfill_outbreak_stats.py
+    python backfill_outbreak_stats.py --since 2026-01-01
+
+The aggregates are normally maintained as predictions are saved; run this once
+after deploying the table, or to repair it. The affected weeks (all, or those
+from --since onward) are deleted and recomputed in one transaction, so counts
+are never doubled and readers never see a half-built table.
+"""
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.database import SessionLocal, Base, engine
+from app.models import DiseaseOutbreakStat  # noqa: F401 - registers the table for create_all
+from app.services.outbreak_stats import iso_week
+
+REBUILD_SQL = """
+INSERT INTO disease_outbreak_stats
+    (district, crop_type, predicted_class, iso_week, count, confidence_sum, updated_at)
+SELECT
+    COALESCE(TRIM(u.district), '') AS district,
+    LOWER(p.crop_type) AS crop_type,
+    p.predicted_class,
+    DATE_FORMAT(p.created_at, '%x-W%v') AS iso_week,
+    COUNT(*),
+    COALESCE(SUM(p.confidence), 0),
+    UTC_TIMESTAMP()
+FROM crop_predictions p
+LEFT JOIN users u ON u.id = p.user_id
+WHERE p.predicted_class IS NOT NULL AND p.created_at IS NOT NULL {since}
+GROUP BY 1, 2, 3, 4
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild district disease outbreak aggregates")
+    parser.add_argument('--since', help="only rebuild ISO weeks from this date (YYYY-MM-DD) onward")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)  # disease_outbreak_stats
+
+    params = {}
+    if args.since:
+        since = datetime.strptime(args.since, "%Y-%m-%d")
+        # start at the Monday of that ISO week so partially covered weeks are rebuilt whole
+        week_start = datetime.fromisocalendar(*since.isocalendar()[:2], 1)
+        params = {"first_week": iso_week(week_start), "week_start": week_start}
+
+    db = SessionLocal()
+    try:
+        if args.since:
+            deleted = db.execute(text("DELETE FROM disease_outbreak_stats WHERE iso_week >= :first_week"), params).rowcount
+            inserted = db.execute(text(REBUILD_SQL.format(since="AND p.created_at >= :week_start")), params).rowcount
+        else:
+            deleted = db.execute(text("DELETE FROM disease_outbreak_stats")).rowcount
+            inserted = db.execute(text(REBUILD_SQL.format(since=""))).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    scope = f"weeks from {params['first_week']}" if args.since else "all weeks"
+    print(f"Rebuilt outbreak stats for {scope}: {deleted} rows replaced by {inserted}")
+
+
+if __name__ == "__main__":
+    main()
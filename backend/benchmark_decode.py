@@ -0,0 +1,88 @@
+"""
+Benchmark full-resolution decoding against the reduced-scale decode path used
+before YOLO preprocessing.
+
+Usage (from the backend folder):
+    python benchmark_decode.py path/to/photos --imgsz 224 --repeat 3
+
+Each mode runs in a fresh process so the reported peak RSS belongs to that
+mode only. Use real-size phone photos (12 MP+) for meaningful numbers.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_mode(mode, paths, imgsz, repeat, out):
+    from PIL import Image
+    import io
+    from app.services.image_preprocessing import decode_image
+
+    blobs = [open(p, 'rb').read() for p in paths]
+    baseline_rss = _peak_rss_mb()
+    timings = []
+    for _ in range(repeat):
+        for blob in blobs:
+            started = time.perf_counter()
+            if mode == 'full':
+                image = Image.open(io.BytesIO(blob)).convert('RGB')
+            else:
+                image = decode_image(blob, imgsz)
+            timings.append((time.perf_counter() - started) * 1000)
+            del image
+    out.put({
+        'mode': mode,
+        'images': len(blobs) * repeat,
+        'mean_ms': statistics.mean(timings),
+        'p95_ms': sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0],
+        'peak_rss_mb': _peak_rss_mb(),
+        'peak_rss_over_baseline_mb': _peak_rss_mb() - baseline_rss,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full decode vs reduced-scale decode")
+    parser.add_argument('folder')
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.folder, f) for f in sorted(os.listdir(args.folder))
+             if f.lower().endswith(IMAGE_EXTENSIONS)]
+    if not paths:
+        print(f"No images found in {args.folder}")
+        return
+
+    print(f"Benchmarking {len(paths)} images x {args.repeat} repeats, imgsz={args.imgsz}")
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for mode in ('full', 'fast'):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(mode, paths, args.imgsz, args.repeat, out))
+        proc.start()
+        results.append(out.get())
+        proc.join()
+
+    print(f"{'mode':<6} {'mean ms':>9} {'p95 ms':>9} {'peak RSS MB':>12} {'over base MB':>13}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['mean_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['peak_rss_mb']:>12.1f} {r['peak_rss_over_baseline_mb']:>13.1f}")
+    full, fast = results
+    if fast['mean_ms'] > 0:
+        print(f"\nDecode speed-up: {full['mean_ms'] / fast['mean_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
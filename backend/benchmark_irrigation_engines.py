@@ -0,0 +1,95 @@
+"""
+Compare the torch and NumPy irrigation engines: import + load time, peak RSS
+and batch latency.
+
+Usage (from the backend folder):
+    python export_irrigation_model.py path/to/training/irrigation --out-dir path/to/training/irrigation
+    python benchmark_irrigation_engines.py path/to/training/irrigation --rows 1,100,5000
+
+The folder needs both the legacy files (irrigation_model.pt + *.pkl) and
+irrigation_bundle.npz. Each engine runs in a fresh process, so load time and
+peak RSS cover everything that engine needs to start: PyTorch plus the
+sklearn pickles for torch, and NumPy alone for the bundle.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_engine(engine, model_dir, batch_sizes, repeat, out):
+    import numpy as np
+
+    baseline_rss = _peak_rss_mb()
+    started = time.perf_counter()
+    from app.services.irrigation_model_service import load_model_state
+    state = load_model_state(model_dir, engine)
+    load_seconds = time.perf_counter() - started
+    model = state.model
+
+    from app.services.irrigation_bundle import BUNDLE_FILE, IrrigationBundle
+    bundle = IrrigationBundle(os.path.join(model_dir, BUNDLE_FILE))  # scaler stats for realistic inputs
+    rng = np.random.default_rng(0)
+    latencies = {}
+    for size in batch_sizes:
+        features = (bundle.mean + bundle.scale * rng.standard_normal((size, len(bundle.mean)))).astype(np.float32)
+        model.logits(features)  # first call outside the timing
+        timings = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            model.logits(features)
+            timings.append((time.perf_counter() - t0) * 1000)
+        latencies[size] = statistics.median(timings)
+
+    out.put({
+        'engine': engine,
+        'load_seconds': load_seconds,
+        'peak_rss_mb': _peak_rss_mb(),
+        'rss_over_baseline_mb': _peak_rss_mb() - baseline_rss,
+        'torch_imported': 'torch' in sys.modules,
+        'latency_ms': latencies,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark torch vs NumPy irrigation inference")
+    parser.add_argument('model_dir')
+    parser.add_argument('--rows', default='1,100,5000', help="comma-separated batch sizes")
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    batch_sizes = [int(n) for n in args.rows.split(',') if n.strip()]
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for engine in ('torch', 'numpy'):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_engine, args=(engine, args.model_dir, batch_sizes, args.repeat, out))
+        proc.start()
+        results.append(out.get())
+        proc.join()
+
+    header = f"{'engine':<7} {'load s':>7} {'peak RSS MB':>12} {'over base MB':>13} {'torch':>6}"
+    header += "".join(f" {f'{n} rows ms':>13}" for n in batch_sizes)
+    print(header)
+    for r in results:
+        line = (f"{r['engine']:<7} {r['load_seconds']:>7.2f} {r['peak_rss_mb']:>12.1f} "
+                f"{r['rss_over_baseline_mb']:>13.1f} {str(r['torch_imported']):>6}")
+        line += "".join(f" {r['latency_ms'][n]:>13.3f}" for n in batch_sizes)
+        print(line)
+    torch_result, numpy_result = results
+    print(f"\nStartup: {torch_result['load_seconds'] - numpy_result['load_seconds']:.2f}s faster, "
+          f"peak RSS: {torch_result['peak_rss_mb'] - numpy_result['peak_rss_mb']:.0f} MB lower with the NumPy engine")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compare memory and latency of the per-crop serving mode (one best.pt per crop)
+against the shared-backbone multi_crop.pt.
+
+Usage (from the backend folder):
+    python benchmark_serving.py --images path/to/photos --repeat 5
+
+Each mode runs in a fresh process so the reported RSS belongs to that mode
+only. Without --images a synthetic 224x224 image is used, which is enough
+for memory and latency but not for comparing predictions.
+"""
+
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import time
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _load_images(folder, imgsz):
+    from PIL import Image
+    from app.services.image_preprocessing import decode_image
+
+    if not folder:
+        return [Image.new('RGB', (imgsz, imgsz), (90, 140, 60))]
+    paths = [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+             if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return [decode_image(open(p, 'rb').read(), imgsz) for p in paths]
+
+
+def _run_mode(mode, crops, folder, repeat, out):
+    from app import config
+    from app.services.inference_backends import UltralyticsModel, SharedBackboneModel
+    from app.services.model_registry import MODELS_BASE_PATH, CROP_MODEL_DIRS
+
+    baseline = _rss_mb()
+    started = time.perf_counter()
+    if mode == 'per_crop':
+        models = {}
+        for crop in crops:
+            path = os.path.join(MODELS_BASE_PATH, CROP_MODEL_DIRS[crop], 'weights', 'best.pt')
+            if os.path.exists(path):
+                models[crop] = UltralyticsModel(path)
+    else:
+        shared = SharedBackboneModel(config.DISEASE_SHARED_MODEL_PATH)
+        models = {crop: shared.view(crop) for crop in crops if shared.view(crop) is not None}
+    load_seconds = time.perf_counter() - started
+    loaded_rss = _rss_mb()
+
+    images = _load_images(folder, 224)
+    timings = []
+    for _ in range(repeat):
+        for model in models.values():
+            for image in images:
+                t0 = time.perf_counter()
+                model.predict([image])
+                timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    out.put({
+        'mode': mode,
+        'crops': len(models),
+        'load_s': load_seconds,
+        'rss_loaded_mb': loaded_rss,
+        'rss_models_mb': loaded_rss - baseline,
+        'mean_ms': statistics.mean(timings) if timings else 0.0,
+        'p95_ms': timings[max(0, int(len(timings) * 0.95) - 1)] if timings else 0.0,
+    })
+
+
+def main():
+    from app.services.model_registry import CROP_MODEL_DIRS
+
+    parser = argparse.ArgumentParser(description="Compare per-crop and shared-backbone serving")
+    parser.add_argument('--images', default='', help="folder of sample photos (default: synthetic image)")
+    parser.add_argument('--crops', default='', help="comma-separated crops (default: all)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    crops = [c.strip() for c in args.crops.split(',') if c.strip()] or list(CROP_MODEL_DIRS)
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for mode in ('per_crop', 'shared'):
+        out = ctx.Queue()
+        proc = ctx.Process(target=_run_mode, args=(mode, crops, args.images, args.repeat, out))
+        proc.start()
+        proc.join()
+        if proc.exitcode != 0 or out.empty():
+            print(f"⚠ {mode} run failed (exit code {proc.exitcode})")
+            continue
+        results.append(out.get())
+
+    print(f"{'mode':<9} {'crops':>5} {'load s':>7} {'RSS MB':>8} {'models MB':>10} {'mean ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(f"{r['mode']:<9} {r['crops']:>5} {r['load_s']:>7.1f} {r['rss_loaded_mb']:>8.1f} "
+              f"{r['rss_models_mb']:>10.1f} {r['mean_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
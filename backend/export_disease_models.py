@@ -0,0 +1,118 @@
+"""
+Export the per-crop YOLO disease classifiers for the ONNX / TorchScript backends
+and check that the exported models agree with the PyTorch path.
+
+Usage (from the backend folder):
+    python export_disease_models.py --format onnx
+    python export_disease_models.py --format torchscript --crops rice,wheat
+    python export_disease_models.py --format onnx --check samples/
+
+The sample folder for --check holds images either directly or in one
+sub-folder per crop (samples/rice/*.jpg, samples/wheat/*.jpg, ...).
+Exported files are written next to each best.pt (weights/best.onnx,
+weights/best.torchscript), which is where the registry looks for them.
+The crop identifier for crop_type=auto is exported with `--crops crop_id`.
+"""
+
+import argparse
+import os
+import sys
+
+from PIL import Image
+
+from app import config
+from app.services.model_registry import MODELS_BASE_PATH, CROP_MODEL_DIRS, CROP_ID_KEY
+from app.services.inference_backends import UltralyticsModel, get_backend
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+MODEL_DIRS = dict(CROP_MODEL_DIRS, **{CROP_ID_KEY: config.DISEASE_CROP_ID_MODEL_DIR})
+
+
+def export_crop(crop: str, fmt: str, imgsz: int):
+    from ultralytics import YOLO
+
+    pt_path = os.path.join(MODELS_BASE_PATH, MODEL_DIRS[crop], 'weights', 'best.pt')
+    if not os.path.exists(pt_path):
+        print(f"⚠ Model not found for {crop}: {pt_path}")
+        return None
+    model = YOLO(pt_path)
+    kwargs = {'format': fmt, 'imgsz': imgsz}
+    if fmt == 'onnx':
+        # dynamic batch so the micro-batcher can send several images per run
+        kwargs.update(dynamic=True, simplify=True)
+    out_path = model.export(**kwargs)
+    print(f"✓ Exported {crop}: {out_path}")
+    return out_path
+
+
+def sample_images(sample_dir: str, crop: str):
+    crop_dir = os.path.join(sample_dir, crop)
+    folder = crop_dir if os.path.isdir(crop_dir) else sample_dir
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            yield os.path.join(folder, name)
+
+
+def check_parity(crop: str, fmt: str, sample_dir: str) -> bool:
+    """Compare top-1 classes of the exported model against the PyTorch model."""
+    dir_path = os.path.join(MODELS_BASE_PATH, MODEL_DIRS[crop], 'weights')
+    backend = get_backend(fmt)
+    exported_path = os.path.join(dir_path, backend.weights_file)
+    if not os.path.exists(exported_path):
+        print(f"⚠ No exported {fmt} model for {crop}, skipping parity check")
+        return True
+
+    reference = UltralyticsModel(os.path.join(dir_path, 'best.pt'))
+    exported = backend(exported_path)
+    if reference.names != exported.names:
+        print(f"✗ {crop}: class names differ between best.pt and {backend.weights_file}")
+        return False
+
+    total = mismatches = 0
+    for path in sample_images(sample_dir, crop):
+        image = Image.open(path).convert('RGB')
+        ref_probs = reference.predict([image])[0]
+        exp_probs = exported.predict([image])[0]
+        ref_top = max(range(len(ref_probs)), key=ref_probs.__getitem__)
+        exp_top = max(range(len(exp_probs)), key=exp_probs.__getitem__)
+        total += 1
+        if ref_top != exp_top:
+            mismatches += 1
+            print(f"  ✗ {os.path.basename(path)}: pytorch={reference.names[ref_top]} {fmt}={exported.names[exp_top]}")
+
+    if total == 0:
+        print(f"⚠ No sample images found for {crop} in {sample_dir}")
+        return True
+    print(f"{'✓' if mismatches == 0 else '✗'} {crop}: top-1 agreement {total - mismatches}/{total}")
+    return mismatches == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export crop disease classifiers for CPU inference backends")
+    parser.add_argument('--format', choices=['onnx', 'torchscript'], default='onnx')
+    parser.add_argument('--crops', default='', help="comma-separated crops (default: all)")
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--check', metavar='SAMPLE_DIR', help="run the top-1 parity check on these images")
+    parser.add_argument('--check-only', action='store_true', help="skip exporting, only run --check")
+    args = parser.parse_args()
+
+    crops = [c.strip() for c in args.crops.split(',') if c.strip()] or list(CROP_MODEL_DIRS)
+    unknown = [c for c in crops if c not in MODEL_DIRS]
+    if unknown:
+        parser.error(f"unknown crops: {unknown}")
+
+    if not args.check_only:
+        for crop in crops:
+            try:
+                export_crop(crop, args.format, args.imgsz)
+            except Exception as e:
+                print(f"✗ Error exporting {crop}: {e}")
+
+    if args.check:
+        ok = all([check_parity(crop, args.format, args.check) for crop in crops])
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
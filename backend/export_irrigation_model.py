@@ -0,0 +1,85 @@
+"""
+Package the trained irrigation model into a single-file bundle and check that
+the bundle's NumPy forward pass agrees with PyTorch.
+
+Usage (from the backend folder):
+    python export_irrigation_model.py path/to/training/irrigation
+    python export_irrigation_model.py path/to/training/irrigation --out-dir app/ml_models/irrigation
+
+The source folder holds the training outputs: irrigation_model.pt plus
+le_crop.pkl, le_soil.pkl, le_season.pkl, le_target.pkl and scaler_X.pkl.
+The bundle (irrigation_bundle.npz) carries the weights, scaler parameters,
+encoder classes, feature order and a content hash that becomes the
+model_version reported with every prediction. It is written to --out-dir
+(default IRRIGATION_MODEL_DIR) via an atomic rename, so a running server
+swaps it in on its next reload check.
+
+The parity check feeds both engines random rows spread around the training
+distribution and exits non-zero, before writing to --out-dir, if any logit
+differs by more than --tolerance or any predicted class differs.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import joblib
+import numpy as np
+import torch
+
+from app import config
+from app.services.irrigation_backends import INPUT_SIZE, TorchIrrigationModel, linear_layers, scaler_params
+from app.services.irrigation_bundle import BUNDLE_FILE, CATEGORY_FIELDS, IrrigationBundle, write_bundle
+from app.services.irrigation_model_service import FEATURE_ORDER, LEGACY_MODEL_FILE
+
+
+def _sample_features(mean, scale, rows, seed):
+    rng = np.random.default_rng(seed)
+    features = mean + scale * rng.standard_normal((rows, INPUT_SIZE))
+    features[:, :3] = np.clip(np.rint(features[:, :3]), 0, None)  # label-encoded categoricals
+    return features.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build irrigation_bundle.npz and check parity with PyTorch")
+    parser.add_argument('source_dir', help="folder with irrigation_model.pt and the le_*.pkl / scaler_X.pkl files")
+    parser.add_argument('--out-dir', default=config.IRRIGATION_MODEL_DIR)
+    parser.add_argument('--check-rows', type=int, default=10000)
+    parser.add_argument('--tolerance', type=float, default=1e-4, help="max allowed absolute logit difference")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    model_path = os.path.join(args.source_dir, LEGACY_MODEL_FILE)
+    classes = {
+        field: list(joblib.load(os.path.join(args.source_dir, f'le_{field}.pkl')).classes_)
+        for field in CATEGORY_FIELDS
+    }
+    mean, scale = scaler_params(joblib.load(os.path.join(args.source_dir, 'scaler_X.pkl')))
+    layers = linear_layers(torch.load(model_path, map_location=torch.device('cpu')))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        staged = os.path.join(tmp_dir, BUNDLE_FILE)
+        version = write_bundle(staged, layers, mean, scale, classes, FEATURE_ORDER)
+        bundle = IrrigationBundle(staged)
+        print(f"✓ Built bundle {version} ({os.path.getsize(staged) / 1024:.1f} KB)")
+
+        if args.check_rows > 0:
+            features = _sample_features(mean, scale, args.check_rows, args.seed)
+            torch_logits = TorchIrrigationModel(model_path, mean, scale).logits(features)
+            numpy_logits = bundle.numpy_model().logits(features)
+            max_diff = float(np.max(np.abs(torch_logits - numpy_logits)))
+            mismatches = int(np.sum(np.argmax(torch_logits, axis=1) != np.argmax(numpy_logits, axis=1)))
+            print(f"Parity on {args.check_rows} rows: max |logit diff| = {max_diff:.2e}, class mismatches = {mismatches}")
+            if max_diff > args.tolerance or mismatches:
+                print("✗ Bundle does not match PyTorch; not installed")
+                sys.exit(1)
+            print("✓ Bundle matches PyTorch")
+
+        os.makedirs(args.out_dir, exist_ok=True)
+        version = write_bundle(os.path.join(args.out_dir, BUNDLE_FILE), layers, mean, scale, classes, FEATURE_ORDER)
+    print(f"✓ Installed {os.path.join(args.out_dir, BUNDLE_FILE)} (model_version {version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Convert legacy CropPrediction.probabilities JSON into the packed float16 array
+plus a model_versions reference.
+
+Usage (from the backend folder):
+    python migrate_probabilities.py --dry-run
+    python migrate_probabilities.py --batch 500
+
+Rows are processed in id order in batches of --batch, one transaction per
+batch, so the script can be stopped and re-run at any time; rows that are
+already packed are skipped. Each distinct class list of a crop becomes one
+model_versions row tagged legacy-<hash>. The JSON text is cleared unless
+--keep-json is given.
+"""
+
+import argparse
+import json
+
+from app.database import SessionLocal, ensure_crop_prediction_probability_columns, Base, engine
+from app.models import CropPrediction
+from app.services.probability_store import model_version_store, pack_probabilities, legacy_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack legacy probability JSON on crop_predictions")
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--keep-json', action='store_true', help="leave the legacy JSON column in place")
+    parser.add_argument('--dry-run', action='store_true', help="report the size change without writing")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)  # model_versions
+    ensure_crop_prediction_probability_columns()
+
+    migrated = skipped = json_bytes = packed_bytes = 0
+    last_id = 0
+    db = SessionLocal()
+    try:
+        while True:
+            rows = (
+                db.query(CropPrediction)
+                .filter(CropPrediction.id > last_id, CropPrediction.probabilities.isnot(None), CropPrediction.probs_packed.is_(None))
+                .order_by(CropPrediction.id)
+                .limit(args.batch)
+                .all()
+            )
+            if not rows:
+                break
+            for row in rows:
+                last_id = row.id
+                try:
+                    probs = json.loads(row.probabilities)
+                except (TypeError, ValueError):
+                    probs = None
+                if not isinstance(probs, dict) or not probs:
+                    skipped += 1
+                    continue
+                packed = pack_probabilities([float(p) for p in probs.values()])
+                json_bytes += len(row.probabilities.encode('utf-8'))
+                packed_bytes += len(packed)
+                migrated += 1
+                if args.dry_run:
+                    continue
+                crop_type = (row.crop_type or '').lower()
+                row.model_version_id = model_version_store.resolve(crop_type, legacy_version(probs.keys()), probs.keys())
+                row.probs_packed = packed
+                if not args.keep_json:
+                    row.probabilities = None
+            if args.dry_run:
+                db.expunge_all()
+            else:
+                db.commit()
+            print(f"... up to id {last_id}: {migrated} migrated, {skipped} skipped")
+    finally:
+        db.close()
+
+    action = "Would migrate" if args.dry_run else "Migrated"
+    print(f"{action} {migrated} rows ({skipped} unparseable rows skipped)")
+    if migrated:
+        print(f"Probability payload: {json_bytes / 1024:.1f} KB JSON -> {packed_bytes / 1024:.1f} KB packed "
+              f"({100.0 * (1 - packed_bytes / json_bytes):.0f}% smaller)")
+
+
+if __name__ == "__main__":
+    main()
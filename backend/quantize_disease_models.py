@@ -0,0 +1,217 @@
+"""
+Quantize the exported ONNX disease classifiers to int8 and report, per crop,
+how accuracy and CPU latency change so DISEASE_INT8_CROPS can be chosen.
+
+Usage (from the backend folder, after export_disease_models.py --format onnx):
+    python quantize_disease_models.py --samples samples/
+    python quantize_disease_models.py --samples samples/ --mode dynamic --crops rice,wheat
+    python quantize_disease_models.py --samples samples/ --report-only
+
+The sample folder holds images per crop, either unlabelled (samples/rice/*.jpg)
+or labelled by class (samples/rice/<class name>/*.jpg). Static quantization
+calibrates activation ranges on part of each crop's images; the rest are used
+for the report. Every crop is compared with its fp32 best.onnx on top-1
+agreement, plus accuracy when labels are available. Quantized models are
+written next to best.onnx as weights/best.int8.onnx.
+"""
+
+import argparse
+import csv
+import os
+import random
+import statistics
+import time
+
+from app.services.model_registry import MODELS_BASE_PATH
+from app.services.inference_backends import OnnxModel, INT8_WEIGHTS_FILE, preprocess_batch
+from app.services.image_preprocessing import decode_image
+from export_disease_models import MODEL_DIRS, IMAGE_EXTENSIONS
+
+
+def labelled_samples(sample_dir: str, crop: str):
+    """(path, class name or None) for every image under sample_dir/<crop>."""
+    crop_dir = os.path.join(sample_dir, crop)
+    if not os.path.isdir(crop_dir):
+        return []
+    samples = []
+    for root, _, files in os.walk(crop_dir):
+        label = None if os.path.samefile(root, crop_dir) else os.path.relpath(root, crop_dir).split(os.sep)[0]
+        samples.extend((os.path.join(root, f), label) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+    return samples
+
+
+class _CalibrationReader:
+    """Feeds preprocessed sample images to the ONNX Runtime calibrator, one at a time."""
+
+    def __init__(self, input_name: str, paths, imgsz: int):
+        self.input_name = input_name
+        self.paths = iter(paths)
+        self.imgsz = imgsz
+
+    def get_next(self):
+        path = next(self.paths, None)
+        if path is None:
+            return None
+        image = decode_image(open(path, 'rb').read(), self.imgsz)
+        return {self.input_name: preprocess_batch([image], self.imgsz)}
+
+    def rewind(self):
+        pass
+
+
+def quantize_crop(crop: str, mode: str, calib_paths, per_channel: bool) -> bool:
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader, CalibrationMethod, QuantFormat, QuantType, quantize_dynamic, quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    weights_dir = os.path.join(MODELS_BASE_PATH, MODEL_DIRS[crop], 'weights')
+    fp32_path = os.path.join(weights_dir, 'best.onnx')
+    int8_path = os.path.join(weights_dir, INT8_WEIGHTS_FILE)
+    if not os.path.exists(fp32_path):
+        print(f"⚠ No best.onnx for {crop}, run export_disease_models.py --format onnx first")
+        return False
+
+    prepared_path = os.path.join(weights_dir, 'best.preprocessed.onnx')
+    tmp_path = int8_path + '.tmp'
+    try:
+        quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+        if mode == 'static':
+            if not calib_paths:
+                print(f"⚠ No calibration images for {crop}, skipping static quantization")
+                return False
+            reference = OnnxModel(fp32_path)
+            reader = _CalibrationReader(reference.input_name, calib_paths, reference.imgsz)
+            CalibrationDataReader.register(_CalibrationReader)
+            quantize_static(
+                prepared_path, tmp_path, reader,
+                quant_format=QuantFormat.QDQ,
+                per_channel=per_channel,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                calibrate_method=CalibrationMethod.MinMax,
+            )
+        else:
+            quantize_dynamic(prepared_path, tmp_path, per_channel=per_channel, weight_type=QuantType.QInt8)
+
+        # keep the class names / imgsz metadata that OnnxModel reads
+        source, quantized = onnx.load(fp32_path), onnx.load(tmp_path)
+        del quantized.metadata_props[:]
+        quantized.metadata_props.extend(source.metadata_props)
+        onnx.save(quantized, tmp_path)
+        os.replace(tmp_path, int8_path)
+    finally:
+        for path in (prepared_path, tmp_path):
+            if os.path.exists(path):
+                os.remove(path)
+    print(f"✓ Quantized {crop} ({mode}): {int8_path}")
+    return True
+
+
+def _top1(probs):
+    return max(range(len(probs)), key=probs.__getitem__)
+
+
+def evaluate_crop(crop: str, samples, repeat: int):
+    """Compare best.int8.onnx with best.onnx on `samples`; None if either is missing."""
+    weights_dir = os.path.join(MODELS_BASE_PATH, MODEL_DIRS[crop], 'weights')
+    fp32_path = os.path.join(weights_dir, 'best.onnx')
+    int8_path = os.path.join(weights_dir, INT8_WEIGHTS_FILE)
+    if not (os.path.exists(fp32_path) and os.path.exists(int8_path)) or not samples:
+        return None
+
+    fp32, int8 = OnnxModel(fp32_path), OnnxModel(int8_path)
+    images = [(decode_image(open(path, 'rb').read(), fp32.imgsz), label) for path, label in samples]
+    class_ids = {name: idx for idx, name in fp32.names.items()}
+
+    agree = labelled = fp32_correct = int8_correct = 0
+    timings = {'fp32': [], 'int8': []}
+    for image, label in images:
+        tops = {}
+        for name, model in (('fp32', fp32), ('int8', int8)):
+            model.predict([image])  # warm the session before timing
+            for _ in range(repeat):
+                started = time.perf_counter()
+                probs = model.predict([image])[0]
+                timings[name].append((time.perf_counter() - started) * 1000)
+            tops[name] = _top1(probs)
+        agree += tops['fp32'] == tops['int8']
+        if label in class_ids:
+            labelled += 1
+            fp32_correct += tops['fp32'] == class_ids[label]
+            int8_correct += tops['int8'] == class_ids[label]
+
+    fp32_ms, int8_ms = statistics.mean(timings['fp32']), statistics.mean(timings['int8'])
+    return {
+        'crop': crop,
+        'images': len(images),
+        'top1_agreement': round(agree / len(images), 4),
+        'fp32_accuracy': round(fp32_correct / labelled, 4) if labelled else '',
+        'int8_accuracy': round(int8_correct / labelled, 4) if labelled else '',
+        'fp32_ms': round(fp32_ms, 2),
+        'int8_ms': round(int8_ms, 2),
+        'speedup': round(fp32_ms / int8_ms, 2) if int8_ms else '',
+        'fp32_mb': round(os.path.getsize(fp32_path) / (1024 * 1024), 1),
+        'int8_mb': round(os.path.getsize(int8_path) / (1024 * 1024), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Int8-quantize ONNX crop disease models and report accuracy vs latency")
+    parser.add_argument('--samples', required=True, help="folder with one sub-folder of sample images per crop")
+    parser.add_argument('--crops', default='', help="comma-separated crops (default: all, plus crop_id)")
+    parser.add_argument('--mode', choices=['static', 'dynamic'], default='static',
+                        help="static calibrates activations (best for these conv nets); dynamic quantizes weights only")
+    parser.add_argument('--calib-size', type=int, default=100, help="calibration images per crop")
+    parser.add_argument('--no-per-channel', action='store_true', help="per-tensor instead of per-channel weights")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per image and precision")
+    parser.add_argument('--min-agreement', type=float, default=0.98, help="agreement needed to recommend int8")
+    parser.add_argument('--report', default='quantization_report.csv')
+    parser.add_argument('--report-only', action='store_true', help="skip quantizing, only evaluate existing files")
+    args = parser.parse_args()
+
+    crops = [c.strip() for c in args.crops.split(',') if c.strip()] or list(MODEL_DIRS)
+    unknown = [c for c in crops if c not in MODEL_DIRS]
+    if unknown:
+        parser.error(f"unknown crops: {unknown}")
+
+    random.seed(0)
+    rows = []
+    for crop in crops:
+        samples = labelled_samples(args.samples, crop)
+        random.shuffle(samples)
+        calib, held_out = samples[:args.calib_size], samples[args.calib_size:]
+        if not args.report_only:
+            try:
+                quantize_crop(crop, args.mode, [path for path, _ in calib], not args.no_per_channel)
+            except Exception as e:
+                print(f"✗ Error quantizing {crop}: {e}")
+                continue
+        # report on images the calibrator did not see, when there are any
+        row = evaluate_crop(crop, held_out or samples, args.repeat)
+        if row is None:
+            print(f"⚠ Nothing to report for {crop} (missing samples or model files)")
+            continue
+        row['recommend_int8'] = row['top1_agreement'] >= args.min_agreement and (row['speedup'] or 0) > 1.0
+        rows.append(row)
+
+    if not rows:
+        return
+    columns = list(rows[0])
+    with open(args.report, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"\n{'crop':<12} {'imgs':>5} {'agree':>6} {'acc fp32':>9} {'acc int8':>9} {'fp32 ms':>8} {'int8 ms':>8} {'speedup':>8} {'int8':>5}")
+    for r in rows:
+        print(f"{r['crop']:<12} {r['images']:>5} {r['top1_agreement']:>6} {str(r['fp32_accuracy']):>9} {str(r['int8_accuracy']):>9} "
+              f"{r['fp32_ms']:>8} {r['int8_ms']:>8} {str(r['speedup']):>8} {'yes' if r['recommend_int8'] else 'no':>5}")
+    recommended = [r['crop'] for r in rows if r['recommend_int8']]
+    print(f"\nReport written to {args.report}")
+    print(f"Suggested setting: DISEASE_INT8_CROPS={','.join(recommended)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Train the lightweight crop-identification classifier used by crop_type=auto.
+
+Usage (from the backend folder):
+    python train_crop_identifier.py --data datasets/leaves --epochs 10
+where datasets/leaves/<crop>/**/*.jpg holds images for each crop (the same
+layout train_shared_backbone.py uses). Sub-folder names must be crop keys
+such as rice or black_gram. The run is written next to the per-crop models,
+runs/classify/<DISEASE_CROP_ID_MODEL_DIR>/weights/best.pt, where the service
+picks it up; export it with the other models for the onnx/torchscript backends.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+
+from app import config
+from app.services.model_registry import MODELS_BASE_PATH, CROP_MODEL_DIRS
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def list_images(folder: str):
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+
+def build_split(data_dir: str, out_dir: str, val_fraction: float, per_crop_limit: int):
+    """Link images into the train/<crop>, val/<crop> layout Ultralytics expects."""
+    counts = {}
+    for crop in sorted(os.listdir(data_dir)):
+        if crop not in CROP_MODEL_DIRS:
+            print(f"⚠ Skipping folder '{crop}': not a known crop type")
+            continue
+        images = list_images(os.path.join(data_dir, crop))
+        random.shuffle(images)
+        if per_crop_limit:
+            images = images[:per_crop_limit]
+        n_val = max(1, int(len(images) * val_fraction))
+        for split, subset in (('val', images[:n_val]), ('train', images[n_val:])):
+            target = os.path.join(out_dir, split, crop)
+            os.makedirs(target, exist_ok=True)
+            for i, path in enumerate(subset):
+                link = os.path.join(target, f"{i:06d}{os.path.splitext(path)[1].lower()}")
+                try:
+                    os.symlink(os.path.abspath(path), link)
+                except OSError:
+                    shutil.copyfile(path, link)
+        counts[crop] = len(images)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the crop identifier for crop_type=auto")
+    parser.add_argument('--data', required=True, help="folder with one sub-folder of images per crop")
+    parser.add_argument('--model', default='yolov8n-cls.pt', help="base classifier (nano keeps the extra stage cheap)")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--imgsz', type=int, default=224,
+                        help="keep equal to the disease models' size so their input array is reused")
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--per-crop-limit', type=int, default=2000, help="cap images per crop (0 = all)")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    random.seed(0)
+    split_dir = tempfile.mkdtemp(prefix='crop_id_')
+    try:
+        counts = build_split(args.data, split_dir, args.val_fraction, args.per_crop_limit)
+        if len(counts) < 2:
+            parser.error("need images for at least two crops")
+        print(f"Training crop identifier on {counts}")
+        model = YOLO(args.model)
+        model.train(
+            data=split_dir,
+            epochs=args.epochs,
+            imgsz=args.imgsz,
+            batch=args.batch,
+            project=MODELS_BASE_PATH,
+            name=config.DISEASE_CROP_ID_MODEL_DIR,
+            exist_ok=True,
+            workers=0,
+        )
+    finally:
+        shutil.rmtree(split_dir, ignore_errors=True)
+    print(f"✓ Crop identifier saved under {os.path.join(MODELS_BASE_PATH, config.DISEASE_CROP_ID_MODEL_DIR)}")
+
+
+if __name__ == "__main__":
+    main()
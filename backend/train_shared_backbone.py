@@ -0,0 +1,155 @@
+"""
+Build the shared-backbone multi-crop disease model from the per-crop YOLO
+classifiers by knowledge distillation.
+
+The student starts from one crop's backbone (--backbone-from) plus a copy of
+every crop's own Classify head, then is trained so that, for each crop's
+images, backbone + that crop's head matches the original best.pt's soft
+predictions. Labels are not needed: the per-crop models are the teachers.
+
+Usage (from the backend folder):
+    python train_shared_backbone.py --data datasets/leaves --epochs 10
+where datasets/leaves/<crop>/**/*.jpg holds images for each crop.
+Serve the result with DISEASE_SERVING_MODE=shared.
+"""
+
+import argparse
+import copy
+import os
+import random
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from PIL import Image
+
+from app import config
+from app.services.model_registry import MODELS_BASE_PATH, CROP_MODEL_DIRS
+from app.services.inference_backends import preprocess_batch
+from app.services.shared_backbone import MultiCropClassifier, head_logits
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def load_teacher(crop: str):
+    from ultralytics import YOLO
+    path = os.path.join(MODELS_BASE_PATH, CROP_MODEL_DIRS[crop], 'weights', 'best.pt')
+    yolo = YOLO(path)
+    net = yolo.model.float().eval()
+    for p in net.parameters():
+        p.requires_grad_(False)
+    layers = list(net.model)
+    return nn.Sequential(*layers[:-1]), layers[-1], yolo.names
+
+
+def list_images(folder: str):
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(paths)
+
+
+def load_batch(paths, imgsz: int):
+    images = []
+    for path in paths:
+        image = Image.open(path).convert('RGB')
+        if random.random() < 0.5:
+            image = image.transpose(Image.FLIP_LEFT_RIGHT)
+        images.append(image)
+    return torch.from_numpy(preprocess_batch(images, imgsz))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distil per-crop YOLO classifiers into one shared-backbone model")
+    parser.add_argument('--data', required=True, help="folder with one sub-folder of images per crop")
+    parser.add_argument('--crops', default='', help="comma-separated crops (default: every crop with data and weights)")
+    parser.add_argument('--backbone-from', default='rice', help="crop whose backbone initialises the student")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-4)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--imgsz', type=int, default=224)
+    parser.add_argument('--out', default=config.DISEASE_SHARED_MODEL_PATH)
+    args = parser.parse_args()
+
+    requested = [c.strip() for c in args.crops.split(',') if c.strip()] or list(CROP_MODEL_DIRS)
+    data = {}
+    for crop in requested:
+        images = list_images(os.path.join(args.data, crop))
+        weights = os.path.join(MODELS_BASE_PATH, CROP_MODEL_DIRS[crop], 'weights', 'best.pt')
+        if images and os.path.exists(weights):
+            data[crop] = images
+        else:
+            print(f"⚠ Skipping {crop}: {'no images' if not images else 'no best.pt'}")
+    if args.backbone_from not in data:
+        parser.error(f"--backbone-from crop '{args.backbone_from}' has no data or weights")
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    teachers, heads, names = {}, {}, {}
+    for crop in data:
+        backbone, head, crop_names = load_teacher(crop)
+        teachers[crop] = nn.Sequential(backbone, head).to(device)
+        heads[crop] = copy.deepcopy(head)
+        names[crop] = dict(crop_names)
+        print(f"Loaded teacher for {crop} ({len(crop_names)} classes, {len(data[crop])} images)")
+
+    student_backbone = copy.deepcopy(teachers[args.backbone_from][0])
+    student = MultiCropClassifier(student_backbone, heads).to(device)
+    for p in student.parameters():
+        p.requires_grad_(True)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr)
+    T = args.temperature
+
+    for epoch in range(args.epochs):
+        # interleave crops batch by batch so the backbone does not drift towards one crop
+        steps = []
+        for crop, paths in data.items():
+            shuffled = random.sample(paths, len(paths))
+            steps.extend((crop, shuffled[i:i + args.batch]) for i in range(0, len(shuffled), args.batch))
+        random.shuffle(steps)
+
+        student.train()
+        total_loss = 0.0
+        for crop, batch_paths in steps:
+            x = load_batch(batch_paths, args.imgsz).to(device)
+            with torch.no_grad():
+                teacher_backbone, teacher_head = teachers[crop]
+                teacher_logits = head_logits(teacher_head, teacher_backbone(x))
+            student_logits = student(x, crop)
+            loss = F.kl_div(
+                F.log_softmax(student_logits / T, dim=1),
+                F.softmax(teacher_logits / T, dim=1),
+                reduction='batchmean',
+            ) * (T * T)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item()
+        print(f"Epoch {epoch + 1}/{args.epochs}: distillation loss {total_loss / max(1, len(steps)):.4f}")
+
+    # report top-1 agreement with the teachers on each crop's images
+    student.eval()
+    with torch.no_grad():
+        for crop, paths in data.items():
+            agree = total = 0
+            for i in range(0, len(paths), args.batch):
+                x = load_batch(paths[i:i + args.batch], args.imgsz).to(device)
+                teacher_backbone, teacher_head = teachers[crop]
+                t_top = head_logits(teacher_head, teacher_backbone(x)).argmax(1)
+                s_top = student(x, crop).argmax(1)
+                agree += int((t_top == s_top).sum())
+                total += len(t_top)
+            print(f"{crop}: top-1 agreement with best.pt {agree}/{total} ({100.0 * agree / max(1, total):.1f}%)")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    torch.save({
+        'model': student.cpu().eval(),
+        'names': names,
+        'imgsz': args.imgsz,
+        'backbone_from': args.backbone_from,
+    }, args.out)
+    print(f"✓ Saved shared-backbone model for {sorted(names)} to {args.out}")
+
+
+if __name__ == "__main__":
+    main()